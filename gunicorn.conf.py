@@ -0,0 +1,24 @@
+"""
+Gunicorn settings shared by Procfile and Procfile.asgi.
+
+The app is preloaded in the master, which then warms it (store.warmup)
+before forking. Every worker therefore starts with its templates compiled,
+its URL resolver built and the category registry loaded, and the memory
+holding them is shared copy-on-write instead of rebuilt per worker.
+"""
+import os
+
+preload_app = True
+
+# WEB_CONCURRENCY is honoured by gunicorn itself; this is only the fallback
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+
+def when_ready(server):
+    from django.db import connections
+
+    from store.warmup import warm_up
+
+    warm_up()
+    # Workers must not share the master's database connection
+    connections.close_all()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_ecom.settings')
+# Serve the catalog reads from their async views
+os.environ.setdefault('STORE_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
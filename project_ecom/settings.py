@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,12 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'store.middleware.CartStorageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -54,7 +57,7 @@ ROOT_URLCONF = 'project_ecom.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'store.instrumentation.InstrumentedTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,6 +66,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'store.context_processors.cart_count',
+                'store.context_processors.categories',
             ],
         },
     },
@@ -82,6 +86,49 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shophub',
+    }
+}
+
+# Catalog pages and fragments are cached for this many seconds and
+# invalidated early whenever a product or category changes
+STORE_CACHE_TIMEOUT = 60 * 15
+
+# Where shopping carts live: SessionCartStorage (database-backed session),
+# CacheCartStorage or SignedCookieCartStorage (see store/cart_storage.py)
+STORE_CART_STORAGE = 'store.cart_storage.SessionCartStorage'
+
+# Per-request query/DB/template/cache timings (see store/instrumentation.py).
+# The Server-Timing header exposes them to browsers, so only send it in DEBUG
+STORE_SERVER_TIMING = DEBUG
+
+# Route the async versions of the catalog read views (see store/views.py)
+# instead of the sync ones. project_ecom/asgi.py turns this on; under WSGI
+# an async view would only add a thread hop to every request
+STORE_ASYNC_VIEWS = os.environ.get('STORE_ASYNC_VIEWS') == 'True'
+
+# Hashed into product page ETags; change it (e.g. to the release's commit)
+# whenever templates change, or browsers keep getting 304 for the old markup
+STORE_ETAG_SALT = os.environ.get('STORE_ETAG_SALT', '')
+
+# Admin changelists take the row count of an unfiltered table from the
+# database statistics, instead of COUNT(*), above this many rows
+STORE_ADMIN_ESTIMATE_COUNTS_ABOVE = 100_000
+
+# Work queued with store.task_queue is run by `manage.py run_worker`; when
+# this is set it runs inline as it is queued instead (the test runner sets it)
+STORE_TASKS_SYNC = False
+
+# Fails any test whose request exceeds its view's @query_budget
+TEST_RUNNER = 'store.test_runner.StoreTestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
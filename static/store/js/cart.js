@@ -0,0 +1,30 @@
+function increaseQuantity(button) {
+    const input = button.parentElement.querySelector('input[type="number"]');
+    const max = parseInt(input.getAttribute('max'));
+    const current = parseInt(input.value);
+    if (current < max) {
+        input.value = current + 1;
+    }
+}
+
+function decreaseQuantity(button) {
+    const input = button.parentElement.querySelector('input[type="number"]');
+    const current = parseInt(input.value);
+    if (current > 1) {
+        input.value = current - 1;
+    }
+}
+
+// Auto-submit form on quantity change (debounced)
+let timeout;
+document.addEventListener('DOMContentLoaded', function() {
+    const quantityInputs = document.querySelectorAll('input[name="quantity"]');
+    quantityInputs.forEach(input => {
+        input.addEventListener('change', function() {
+            clearTimeout(timeout);
+            timeout = setTimeout(() => {
+                this.form.submit();
+            }, 1000);
+        });
+    });
+});
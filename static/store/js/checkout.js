@@ -0,0 +1,12 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('#checkout-form');
+
+    form.addEventListener('submit', function(e) {
+        // Add loading state to button
+        const submitBtn = form.querySelector('button[type="submit"]');
+        submitBtn.disabled = true;
+        submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin mr-2"></i>Processing...';
+
+        // Form will submit normally
+    });
+});
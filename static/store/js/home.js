@@ -0,0 +1,53 @@
+// Infinite scroll: fetch the next keyset page when the Load More link comes into view
+(function () {
+    const loadMore = document.getElementById('load-more');
+    if (!loadMore || !('IntersectionObserver' in window)) {
+        return;
+    }
+    const grid = document.getElementById('product-grid');
+    const counter = document.getElementById('product-count');
+    let loading = false;
+
+    function fetchNextPage() {
+        if (loading || !loadMore.dataset.cursor) {
+            return;
+        }
+        loading = true;
+        const params = new URLSearchParams({cursor: loadMore.dataset.cursor});
+        if (loadMore.dataset.category) {
+            params.set('category', loadMore.dataset.category);
+        }
+        fetch(`${loadMore.dataset.url}?${params}`, {
+            headers: {'X-Requested-With': 'XMLHttpRequest'}
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                return;
+            }
+            grid.insertAdjacentHTML('beforeend', data.html);
+            if (counter) {
+                counter.textContent = parseInt(counter.textContent, 10) + data.count;
+            }
+            if (data.next_cursor) {
+                loadMore.dataset.cursor = data.next_cursor;
+            } else {
+                loadMore.parentElement.remove();
+                observer.disconnect();
+            }
+        })
+        .finally(() => { loading = false; });
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            fetchNextPage();
+        }
+    }, {rootMargin: '400px'});
+    observer.observe(loadMore);
+
+    loadMore.addEventListener('click', event => {
+        event.preventDefault();
+        fetchNextPage();
+    });
+})();
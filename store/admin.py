@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Category, Product, Order, OrderItem
+from django.db.models import F
+from django.utils import timezone
+from .admin_tools import PerformanceAdminMixin, csv_export_action
+from .models import Category, Product, Order, OrderItem, Task
+from .rollups import order_lines, order_snapshot
+from .tasks import record_order_sales
 
 
 @admin.register(Category)
@@ -23,12 +28,18 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'first_name', 'last_name', 'email', 
-                   'status', 'paid', 'get_total_cost', 'created_at')
+                   'status', 'paid', 'total_incl_shipping', 'created_at')
     list_filter = ('status', 'paid', 'created_at')
-    search_fields = ('first_name', 'last_name', 'email', 'id')
-    readonly_fields = ('created_at', 'updated_at', 'get_total_cost')
+    list_select_related = ('user',)
+    search_fields = prefix_search_fields = ('email', 'last_name')
+    search_help_text = 'An order number, or the start of an email address or last name'
+    actions = [csv_export_action((
+        'id', 'created_at', 'user__username', 'first_name', 'last_name', 'email', 'city',
+        'status', 'paid', 'item_count', 'subtotal', 'shipping_cost', 'total',
+    ))]
+    readonly_fields = ('created_at', 'updated_at', 'subtotal', 'shipping_cost', 'total_incl_shipping', 'item_count')
     inlines = [OrderItemInline]
     ordering = ('-created_at',)
     
@@ -42,19 +53,35 @@ class OrderAdmin(admin.ModelAdmin):
         ('Order Status', {
             'fields': ('status', 'paid', 'created_at', 'updated_at')
         }),
+        ('Totals', {
+            'fields': ('item_count', 'subtotal', 'shipping_cost', 'total_incl_shipping')
+        }),
     )
     
-    def get_total_cost(self, obj):
-        return f"${obj.get_total_cost():.2f}"
-    get_total_cost.short_description = 'Total Cost'
+    def total_incl_shipping(self, obj):
+        return f"${obj.total:.2f}"
+    total_incl_shipping.short_description = 'Total incl. shipping'
+    total_incl_shipping.admin_order_field = 'total'
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Inline edits may change quantities, so refresh the stored totals
+        form.instance.update_totals()
+        if not change:
+            record_order_sales.enqueue(order_snapshot(form.instance, order_lines(form.instance)))
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'available', 
                    'created_at')
     list_filter = ('category', 'available', 'created_at')
-    search_fields = ('name', 'description')
+    list_select_related = ('category',)
+    search_fields = prefix_search_fields = ('name',)
+    search_help_text = 'A product id, or the start of a product name'
+    actions = [csv_export_action((
+        'id', 'slug', 'name', 'category__slug', 'price', 'stock', 'available', 'created_at',
+    ))]
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-created_at',)
@@ -74,21 +101,47 @@ class ProductAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('category')
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'order', 'product', 'price', 'quantity', 'get_cost')
+class OrderItemAdmin(PerformanceAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'get_order', 'product', 'price', 'quantity', 'get_cost')
     list_filter = ('order__status', 'product__category')
-    search_fields = ('order__id', 'product__name')
+    list_select_related = ('product',)
+    search_fields = prefix_search_fields = ('product__name',)
+    search_help_text = 'An order number, or the start of a product name'
+    id_search_field = 'order_id'
     readonly_fields = ('get_cost',)
+    actions = [csv_export_action((
+        'id', 'order_id', 'product_id', 'product__name', 'price', 'quantity', 'cost',
+    ))]
+    
+    def get_order(self, obj):
+        # The id is on the item row, so listing it never joins the orders
+        return f'Order {obj.order_id}'
+    get_order.short_description = 'Order'
+    get_order.admin_order_field = 'order'
     
     def get_cost(self, obj):
-        return f"${obj.get_cost():.2f}"
+        cost = obj.cost if hasattr(obj, 'cost') else obj.get_cost()
+        return f"${cost:.2f}"
     get_cost.short_description = 'Total Cost'
+    get_cost.admin_order_field = 'cost'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('order', 'product')
+        return super().get_queryset(request).annotate(cost=F('price') * F('quantity'))
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('name', 'args', 'kwargs', 'attempts', 'claimed_by', 'last_error', 'created_at')
+    actions = ['retry']
+    
+    @admin.action(description='Retry selected tasks now')
+    def retry(self, request, queryset):
+        retried = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(),
+        )
+        self.message_user(request, f'{retried} tasks queued again.')
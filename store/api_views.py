@@ -0,0 +1,170 @@
+"""
+Read-only JSON catalog API for mobile clients and CDNs.
+
+Rows are read with ``.values()`` and kept in the versioned catalog cache,
+so no model instances are built. Every response carries a strong ETag
+computed from the ids and ``updated_at`` of the products and categories
+it contains; a request whose If-None-Match still matches gets a 304
+before anything is serialized. Single products also carry a
+Last-Modified and answer If-Modified-Since. Lists do not: a product that
+is deleted or made unavailable leaves the newest ``updated_at`` of a list
+unchanged, so only the ETag notices.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .catalog_cache import get_or_set
+from .category_registry import category_registry
+from .instrumentation import query_budget
+from .models import Category, Product
+from .pagination import InvalidCursor, decode_cursor, paginate_products
+
+# Shared caches may reuse a response this long before revalidating
+API_MAX_AGE = getattr(settings, 'STORE_API_MAX_AGE', 60)
+
+PRODUCT_FIELDS = (
+    'id', 'name', 'slug', 'price', 'stock', 'image', 'created_at', 'updated_at',
+    'category__slug', 'category__updated_at',
+)
+CATEGORY_FIELDS = ('id', 'name', 'slug', 'description', 'updated_at')
+
+
+def product_json(row):
+    """The API representation of a product ``.values()`` row"""
+    data = {
+        'id': row['id'],
+        'name': row['name'],
+        'slug': row['slug'],
+        'category': row['category__slug'],
+        'price': row['price'],
+        'in_stock': row['stock'] > 0,
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'url': reverse('store:product_detail', args=[row['slug']]),
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+    if 'description' in row:
+        data['description'] = row['description']
+        data['stock'] = row['stock']
+    return data
+
+
+def category_json(row):
+    """The API representation of a category ``.values()`` row"""
+    return {
+        **row,
+        'products': reverse('store:api_category_products', args=[row['slug']]),
+    }
+
+
+def conditional_json(request, rows, build, *extra, dated=False):
+    """
+    Answer with 304 if the client's validators still match ``rows``,
+    otherwise with the JSON object returned by ``build()``.
+
+    The ETag hashes each row's id and modification times plus ``extra``
+    (e.g. the page cursor), so it changes whenever a row is edited, added
+    or removed. With ``dated``, for a single row, Last-Modified is the
+    newest of those times.
+    """
+    stamps = [
+        (row['id'], row['updated_at'], row.get('category__updated_at'))
+        for row in rows
+    ]
+    digest = hashlib.sha1(repr((stamps, extra)).encode()).hexdigest()
+    etag = f'"{digest}"'
+    last_modified = None
+    if dated:
+        times = [stamp for _, *row_times in stamps for stamp in row_times if stamp is not None]
+        last_modified = int(max(times).timestamp()) if times else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(build())
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=API_MAX_AGE)
+    return response
+
+
+def _product_page(request, category=None):
+    cursor = request.GET.get('cursor')
+
+    def build_page():
+        rows = Product.objects.filter(available=True)
+        if category:
+            rows = rows.filter(category_id=category.id)
+        return paginate_products(rows.values(*PRODUCT_FIELDS), cursor=cursor)
+
+    try:
+        if cursor:
+            # Checked before it becomes part of a cache key
+            decode_cursor(cursor)
+        page = get_or_set(
+            ('api-products', category and category.slug, cursor), build_page, depends=lambda page: page,
+        )
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'message': 'Invalid cursor'}, status=400)
+
+    return conditional_json(
+        request, page.items,
+        lambda: {
+            'results': [product_json(row) for row in page],
+            'next_cursor': page.next_cursor,
+        },
+        cursor, page.next_cursor,
+    )
+
+
+@query_budget(2)
+@require_safe
+def product_list(request):
+    """One keyset page of available products, newest first, optionally of ``?category=``"""
+    category = None
+    if request.GET.get('category'):
+        category = category_registry.get(request.GET['category'])
+        if category is None:
+            raise Http404('No category matches the given query.')
+    return _product_page(request, category)
+
+
+@query_budget(2)
+@require_safe
+def product_detail(request, product_slug):
+    """A single available product"""
+    def build_row():
+        return (
+            Product.objects.filter(slug=product_slug, available=True)
+            .values(*PRODUCT_FIELDS, 'description').first()
+        )
+
+    row = get_or_set(('api-product', product_slug), build_row, depends=lambda row: row)
+    if row is None:
+        raise Http404('No product matches the given query.')
+    return conditional_json(request, [row], lambda: product_json(row), dated=True)
+
+
+@query_budget(2)
+@require_safe
+def category_list(request):
+    """Every category, by name"""
+    rows = get_or_set(('api-categories',), lambda: list(Category.objects.values(*CATEGORY_FIELDS)))
+    return conditional_json(request, rows, lambda: {'results': [category_json(row) for row in rows]})
+
+
+@query_budget(2)
+@require_safe
+def category_products(request, category_slug):
+    """One keyset page of the available products in a category"""
+    category = category_registry.get(category_slug)
+    if category is None:
+        raise Http404('No category matches the given query.')
+    return _product_page(request, category)
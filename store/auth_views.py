@@ -6,6 +6,7 @@ from django.contrib.auth.decorators import login_required
 from django.urls import reverse_lazy
 from django.views.generic.edit import CreateView
 from django.contrib.auth.views import LoginView, LogoutView
+from .instrumentation import query_budget
 
 
 class CustomLoginView(LoginView):
@@ -49,6 +50,7 @@ class SignUpView(CreateView):
         return super().form_invalid(form)
 
 
+@query_budget(5)
 @login_required
 def profile(request):
     """User profile view"""
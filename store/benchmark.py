@@ -0,0 +1,200 @@
+"""
+Benchmark harness for the storefront hot paths.
+
+``seed_catalog`` fills the current database with a synthetic catalog,
+shoppers with large carts and long order histories. ``run_benchmarks``
+then drives each scenario through the test client and measures latency,
+query count and peak memory. The ``benchmark`` management command runs
+both against a throwaway test database and writes the report as JSON, so
+two runs can be compared with ``compare_reports``.
+"""
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .cart_storage import SessionCartStorage
+from .catalog_cache import get_cache
+from .instrumentation import percentile
+from .models import Category, Order, OrderItem, Product
+from .search import rebuild_index
+
+
+SCENARIOS = ['home', 'category_products', 'product_detail', 'autocomplete', 'cart', 'checkout', 'order_history']
+
+CHECKOUT_FORM = {
+    'first_name': 'Bench',
+    'last_name': 'Mark',
+    'email': 'bench@example.com',
+    'address': '1 Load Street',
+    'postal_code': '00000',
+    'city': 'Benchville',
+}
+
+
+class Dataset:
+    """What seed_catalog created, for the scenarios to address"""
+
+    def __init__(self, categories, products, users, cart):
+        self.categories = categories
+        self.products = products
+        self.users = users
+        self.cart = cart
+
+
+def seed_catalog(products=1000, categories=20, users=5, cart_lines=25, orders_per_user=100,
+                 items_per_order=3, batch_size=1000):
+    """Bulk-insert a synthetic store and return its Dataset"""
+    category_objs = Category.objects.bulk_create([
+        Category(name=f'Category {i}', slug=f'bench-category-{i}', description='Synthetic category')
+        for i in range(categories)
+    ])
+
+    for start in range(0, products, batch_size):
+        Product.objects.bulk_create([
+            Product(
+                category=category_objs[i % categories],
+                name=f'Bench Product {i}',
+                slug=f'bench-product-{i}',
+                description=f'Synthetic product {i} for benchmarking',
+                price=Decimal(5 + i % 200) + Decimal('0.99'),
+                # Enough stock that repeated checkouts never run out
+                stock=1_000_000,
+            )
+            for i in range(start, min(start + batch_size, products))
+        ])
+    # bulk_create skips the signals that keep the search index in sync
+    rebuild_index(batch_size=batch_size)
+    product_rows = list(Product.objects.order_by('id').values_list('id', 'slug', 'price'))
+
+    user_objs = [
+        User.objects.create_user(f'bench-user-{i}', password='bench-password')
+        for i in range(users)
+    ]
+
+    for user in user_objs:
+        orders = Order.objects.bulk_create([
+            Order(user=user, status='delivered', paid=True, item_count=items_per_order, **CHECKOUT_FORM)
+            for _ in range(orders_per_user)
+        ])
+        items = []
+        for n, order in enumerate(orders):
+            subtotal = Decimal('0.00')
+            for k in range(items_per_order):
+                product_id, _, price = product_rows[(n * items_per_order + k) % len(product_rows)]
+                items.append(OrderItem(order=order, product_id=product_id, price=price, quantity=1))
+                subtotal += price
+            order.subtotal = order.total = subtotal
+        Order.objects.bulk_update(orders, ['subtotal', 'total'], batch_size=batch_size)
+        OrderItem.objects.bulk_create(items, batch_size=batch_size)
+
+    # Spread the cart over the catalog so it is not served from one page
+    step = max(1, len(product_rows) // max(1, cart_lines))
+    cart = {str(product_rows[i][0]): 1 for i in range(0, len(product_rows), step)[:cart_lines]}
+    return Dataset(category_objs, product_rows, user_objs, cart)
+
+
+def _fill_cart(client, cart):
+    session = client.session
+    session[SessionCartStorage.session_key] = dict(cart)
+    session.save()
+
+
+def _scenario_requests(name, client, dataset):
+    """Return (prepare, send) callables for one request of scenario ``name``"""
+    middle = dataset.products[len(dataset.products) // 2]
+    noop = lambda: None
+
+    if name == 'home':
+        return noop, lambda: client.get(reverse('store:home'))
+    if name == 'category_products':
+        url = reverse('store:category_products', args=[dataset.categories[0].slug])
+        return noop, lambda: client.get(url)
+    if name == 'product_detail':
+        url = reverse('store:product_detail', args=[middle[1]])
+        return noop, lambda: client.get(url)
+    if name == 'autocomplete':
+        # Every product name shares this two-letter prefix, the worst case
+        return noop, lambda: client.get(reverse('store:search_autocomplete'), {'q': 'be'})
+    if name == 'cart':
+        return (lambda: _fill_cart(client, dataset.cart)), lambda: client.get(reverse('store:cart'))
+    if name == 'checkout':
+        return (
+            lambda: _fill_cart(client, dataset.cart),
+            lambda: client.post(reverse('store:checkout'), CHECKOUT_FORM),
+        )
+    if name == 'order_history':
+        return noop, lambda: client.get(reverse('store:order_history'))
+    raise ValueError(f'Unknown scenario {name!r}')
+
+
+def run_scenario(name, dataset, iterations=50):
+    """Time ``iterations`` requests of one scenario, starting from a cold cache"""
+    client = Client()
+    client.force_login(dataset.users[0])
+    prepare, send = _scenario_requests(name, client, dataset)
+    get_cache().clear()
+
+    latencies = []
+    queries = []
+    statuses = set()
+    for _ in range(iterations):
+        prepare()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+
+    # Memory is sampled separately because tracemalloc slows every request down
+    prepare()
+    tracemalloc.start()
+    try:
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    warm = sorted(latencies[1:]) or latencies
+    return {
+        'requests': iterations,
+        'statuses': sorted(statuses),
+        'cold_ms': round(latencies[0], 2),
+        'mean_ms': round(statistics.fmean(warm), 2),
+        'p50_ms': round(percentile(warm, 50), 2),
+        'p95_ms': round(percentile(warm, 95), 2),
+        'p99_ms': round(percentile(warm, 99), 2),
+        'queries': statistics.median_low(queries),
+        'queries_max': max(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(dataset, scenarios=SCENARIOS, iterations=50):
+    return {name: run_scenario(name, dataset, iterations) for name in scenarios}
+
+
+def compare_reports(baseline, current, tolerance=0.2):
+    """
+    List regressions of ``current`` against ``baseline``.
+
+    A scenario regresses when its p95 latency grows by more than
+    ``tolerance`` (a fraction) or when it runs more queries than before.
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from .cart_storage import line_quantity
+from .models import Product
+
+
+SHIPPING_THRESHOLD = Decimal('50.00')
+SHIPPING_COST = Decimal('5.99')
+
+
+def shipping_cost_for(subtotal):
+    """Flat shipping rate, free once the subtotal reaches the threshold"""
+    return Decimal('0.00') if subtotal >= SHIPPING_THRESHOLD else SHIPPING_COST
+
+
+@dataclass(slots=True)
+class CartLine:
+    """A stored cart entry resolved against its current Product row"""
+    product: Product
+    quantity: int
+    price: Decimal
+
+    @property
+    def id(self):
+        return str(self.product.id)
+
+    @property
+    def name(self):
+        return self.product.name
+
+    @property
+    def slug(self):
+        return self.product.slug
+
+    @property
+    def image(self):
+        return self.product.image.url if self.product.image else None
+
+    @property
+    def available(self):
+        return self.product.available
+
+    @property
+    def stock(self):
+        return self.product.stock
+
+    @property
+    def item_total(self):
+        return self.price * self.quantity
+
+
+def hydrate_cart(cart):
+    """
+    Resolve every line of a stored cart with a single query.
+
+    Returns ``(lines, stale_ids)``: ``lines`` holds a CartLine for each
+    product that is still available and in stock, in cart order, and
+    ``stale_ids`` lists the cart keys whose product no longer exists.
+    """
+    product_ids = []
+    for product_id in cart:
+        try:
+            product_ids.append(int(product_id))
+        except (TypeError, ValueError):
+            continue
+    products = Product.objects.select_related('category').in_bulk(product_ids)
+
+    lines = []
+    stale_ids = []
+    for product_id, item in cart.items():
+        try:
+            product = products.get(int(product_id))
+        except (TypeError, ValueError):
+            product = None
+        if product is None:
+            stale_ids.append(product_id)
+            continue
+        if not product.available or product.stock <= 0:
+            continue
+        lines.append(CartLine(
+            product=product,
+            quantity=line_quantity(item),
+            price=product.price,
+        ))
+    return lines, stale_ids
@@ -0,0 +1,192 @@
+"""
+Pluggable storage for the shopping cart.
+
+A cart is a compact ``{product_id: quantity}`` mapping; names, prices and
+images are read from the Product rows when the cart is hydrated (see
+store.cart). STORE_CART_STORAGE selects the backend:
+
+* ``SessionCartStorage`` keeps the cart in the Django session (the
+  database by default).
+* ``CacheCartStorage`` keeps it in the cache under a random id held in a
+  cookie. Use a cache shared by all workers, not the per-process LocMem.
+* ``SignedCookieCartStorage`` keeps the whole cart in a signed cookie.
+
+Nothing is read or written until a view touches the cart, so visitors who
+never use it cost no storage I/O at all.
+"""
+import json
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+DEFAULT_STORAGE = 'store.cart_storage.SessionCartStorage'
+CART_COOKIE_NAME = getattr(settings, 'STORE_CART_COOKIE_NAME', 'cart')
+CART_COOKIE_AGE = getattr(settings, 'STORE_CART_COOKIE_AGE', settings.SESSION_COOKIE_AGE)
+
+
+def line_quantity(item):
+    """Quantity of a stored cart line, also accepting the legacy dict format"""
+    if isinstance(item, dict):
+        return int(item.get('quantity', 0))
+    return int(item)
+
+
+def normalize_cart(cart):
+    """Coerce a stored payload into ``{product_id: quantity}``, dropping junk"""
+    if not isinstance(cart, dict):
+        return {}
+    normalized = {}
+    for product_id, item in cart.items():
+        try:
+            quantity = line_quantity(item)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            normalized[str(product_id)] = quantity
+    return normalized
+
+
+class BaseCartStorage:
+    """Loads the cart lazily and persists it only when it was changed"""
+
+    def __init__(self, request):
+        self.request = request
+        self._cart = None
+        self.modified = False
+
+    def load(self):
+        if self._cart is None:
+            self._cart = normalize_cart(self._read())
+        return self._cart
+
+    def save(self, cart):
+        self._cart = cart
+        self.modified = True
+        self._write(cart)
+
+    def clear(self):
+        self.save({})
+
+    def count(self):
+        """Total quantity in the cart, without loading it if nothing was stored"""
+        if self._cart is None and not self.exists():
+            return 0
+        return sum(self.load().values())
+
+    def exists(self):
+        return True
+
+    def update_response(self, response):
+        """Hook for backends that persist through the response"""
+        return response
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _write(self, cart):
+        raise NotImplementedError
+
+
+class SessionCartStorage(BaseCartStorage):
+    session_key = 'cart'
+
+    def exists(self):
+        # Avoids loading a session for visitors that do not have one
+        return (
+            settings.SESSION_COOKIE_NAME in self.request.COOKIES
+            or getattr(self.request.session, 'session_key', None) is not None
+        )
+
+    def _read(self):
+        return self.request.session.get(self.session_key, {})
+
+    def _write(self, cart):
+        if cart:
+            self.request.session[self.session_key] = cart
+        else:
+            self.request.session.pop(self.session_key, None)
+        self.request.session.modified = True
+
+
+class CacheCartStorage(BaseCartStorage):
+    cache_alias = getattr(settings, 'STORE_CART_CACHE_ALIAS', 'default')
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.cart_id = request.get_signed_cookie(CART_COOKIE_NAME, default=None, salt='store.cart')
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def exists(self):
+        return self.cart_id is not None
+
+    def _key(self):
+        return f'store:cart:{self.cart_id}'
+
+    def _read(self):
+        if self.cart_id is None:
+            return {}
+        return self.cache.get(self._key(), {})
+
+    def _write(self, cart):
+        if self.cart_id is None:
+            self.cart_id = secrets.token_urlsafe(24)
+        if cart:
+            self.cache.set(self._key(), cart, CART_COOKIE_AGE)
+        else:
+            self.cache.delete(self._key())
+
+    def update_response(self, response):
+        if self.modified:
+            if self._cart:
+                response.set_signed_cookie(
+                    CART_COOKIE_NAME, self.cart_id, salt='store.cart', max_age=CART_COOKIE_AGE,
+                    httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+                )
+            else:
+                response.delete_cookie(CART_COOKIE_NAME, samesite='Lax')
+        return response
+
+
+class SignedCookieCartStorage(BaseCartStorage):
+    def exists(self):
+        return CART_COOKIE_NAME in self.request.COOKIES
+
+    def _read(self):
+        payload = self.request.get_signed_cookie(CART_COOKIE_NAME, default=None, salt='store.cart')
+        if not payload:
+            return {}
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return {}
+
+    def _write(self, cart):
+        pass
+
+    def update_response(self, response):
+        if self.modified:
+            if self._cart:
+                response.set_signed_cookie(
+                    CART_COOKIE_NAME, json.dumps(self._cart, separators=(',', ':')),
+                    salt='store.cart', max_age=CART_COOKIE_AGE,
+                    httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+                )
+            else:
+                response.delete_cookie(CART_COOKIE_NAME, samesite='Lax')
+        return response
+
+
+def get_cart_storage(request):
+    """Return the cart storage for ``request``, creating it on first use"""
+    storage = getattr(request, 'cart_storage', None)
+    if storage is None:
+        storage_class = import_string(getattr(settings, 'STORE_CART_STORAGE', DEFAULT_STORAGE))
+        storage = storage_class(request)
+        request.cart_storage = storage
+    return storage
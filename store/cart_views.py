@@ -1,23 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from .models import Product
+from .cart import SHIPPING_THRESHOLD, hydrate_cart
+from .cart_storage import get_cart_storage
+from .instrumentation import query_budget
 from decimal import Decimal
 
 
 def get_cart(request):
-    """Get cart from session or create new one"""
-    cart = request.session.get('cart', {})
-    if not isinstance(cart, dict):
-        cart = {}
-    return cart
+    """Get cart as a {product_id: quantity} dict from the configured storage"""
+    return get_cart_storage(request).load()
 
 
 def save_cart(request, cart):
-    """Save cart to session"""
-    request.session['cart'] = cart
-    request.session.modified = True
+    """Save cart to the configured storage"""
+    get_cart_storage(request).save(cart)
 
 
+def get_cart_lines(request):
+    """Get hydrated cart lines, pruning products that no longer exist"""
+    cart = get_cart(request)
+    lines, stale_ids = hydrate_cart(cart)
+    if stale_ids:
+        for product_id in stale_ids:
+            del cart[product_id]
+        save_cart(request, cart)
+    return lines
+
+
+@query_budget(7)
 def add_to_cart(request, product_slug):
     """Add product to cart"""
     product = get_object_or_404(Product, slug=product_slug, available=True)
@@ -27,69 +38,38 @@ def add_to_cart(request, product_slug):
     
     if product_id in cart:
         # Update quantity if product already in cart
-        cart[product_id]['quantity'] += int(request.POST.get('quantity', 1))
+        cart[product_id] += int(request.POST.get('quantity', 1))
         messages.success(request, f'Updated {product.name} quantity in cart.')
     else:
-        # Add new item to cart
-        cart[product_id] = {
-            'name': product.name,
-            'slug': product.slug,
-            'price': str(product.price),
-            'quantity': int(request.POST.get('quantity', 1)),
-            'image': product.image.url if product.image else None,
-        }
+        # Add new item to cart; details are read from the product when shown
+        cart[product_id] = int(request.POST.get('quantity', 1))
         messages.success(request, f'Added {product.name} to cart.')
     
     save_cart(request, cart)
     return redirect('store:cart')
 
 
+@query_budget(5)
 def cart(request):
     """View cart contents"""
-    cart = get_cart(request)
-    cart_items = []
-    total_price = Decimal('0.00')
-    
-    for product_id, item in cart.items():
-        # Get fresh product data for stock validation
-        try:
-            product = Product.objects.get(id=int(product_id))
-            if product.available and product.stock > 0:
-                # Calculate item total
-                item_total = Decimal(item['price']) * item['quantity']
-                total_price += item_total
-                
-                cart_items.append({
-                    'id': product_id,
-                    'product': product,
-                    'name': item['name'],
-                    'slug': item['slug'],
-                    'price': Decimal(item['price']),
-                    'quantity': item['quantity'],
-                    'image': item['image'],
-                    'item_total': item_total,
-                    'available': product.available,
-                    'stock': product.stock,
-                })
-        except Product.DoesNotExist:
-            # Remove invalid items from cart
-            del cart[product_id]
-            save_cart(request, cart)
+    cart_items = get_cart_lines(request)
+    total_price = sum((item.item_total for item in cart_items), Decimal('0.00'))
     
     # Calculate shipping threshold amount
-    shipping_threshold = Decimal('50.00')
+    shipping_threshold = SHIPPING_THRESHOLD
     shipping_needed = max(Decimal('0.00'), shipping_threshold - total_price)
     
     context = {
         'cart_items': cart_items,
         'total_price': total_price,
-        'cart_count': sum(item['quantity'] for item in cart_items),
+        'cart_count': sum(item.quantity for item in cart_items),
         'shipping_needed': shipping_needed,
         'shipping_threshold': shipping_threshold,
     }
     return render(request, 'store/cart.html', context)
 
 
+@query_budget(5)
 def update_cart(request, product_id):
     """Update cart item quantity"""
     if request.method == 'POST':
@@ -103,7 +83,7 @@ def update_cart(request, product_id):
                 try:
                     product = Product.objects.get(id=int(product_id))
                     if new_quantity <= product.stock:
-                        cart[product_id]['quantity'] = new_quantity
+                        cart[product_id] = new_quantity
                         messages.success(request, 'Cart updated successfully.')
                     else:
                         messages.error(request, f'Only {product.stock} items available.')
@@ -118,24 +98,25 @@ def update_cart(request, product_id):
     return redirect('store:cart')
 
 
+@query_budget(5)
 def remove_from_cart(request, product_id):
     """Remove item from cart"""
     cart = get_cart(request)
     product_id = str(product_id)
     
     if product_id in cart:
-        item_name = cart[product_id]['name']
+        item_name = Product.objects.filter(id=int(product_id)).values_list('name', flat=True).first()
         del cart[product_id]
         save_cart(request, cart)
-        messages.success(request, f'Removed {item_name} from cart.')
+        messages.success(request, f'Removed {item_name or "item"} from cart.')
     
     return redirect('store:cart')
 
 
+@query_budget(4)
 def clear_cart(request):
     """Clear entire cart"""
-    if 'cart' in request.session:
-        del request.session['cart']
-        request.session.modified = True
+    if get_cart(request):
+        get_cart_storage(request).clear()
         messages.success(request, 'Cart cleared successfully.')
     return redirect('store:cart')
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+Versioned cache for catalog querysets and rendered catalog fragments.
+
+Every key embeds the current catalog version; saving or deleting a Product
+or Category bumps the version (see store.signals), which orphans all older
+entries at once instead of deleting them one by one.
+
+Checkouts only change stock, so they invalidate per product instead:
+``bump_products`` stamps each product with the next value of a sequence.
+An entry built with ``depends`` records the sequence it was built at and
+the products it holds, and is rebuilt once any of them carries a later
+stamp. Rendered fragments are keyed by the ``updated_at`` of the products
+they show, so they follow the entries they are rendered from.
+
+Both kinds of invalidation record when they happened. For STORE_REPLICA_LAG
+seconds afterwards entries are rebuilt from the primary database, so a
+lagging read replica cannot fill them with the rows from before the change.
+
+The versions are only seen by other processes (gunicorn workers,
+run_worker, management commands) through a shared backend: the file-based
+cache on one machine, Redis across machines. The store.E001 deploy check
+rejects process-local ones. Only ``get``, ``get_many``, ``set``,
+``set_many``, ``add`` and ``incr`` are used, so any such backend works.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .db_routers import primary_reads
+from .instrumentation import record_cache_access
+
+
+CACHE_ALIAS = getattr(settings, 'STORE_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'STORE_CACHE_TIMEOUT', 60 * 15)
+# Seconds a read replica may trail the primary
+REPLICA_LAG = getattr(settings, 'STORE_REPLICA_LAG', 5)
+VERSION_KEY = 'store:catalog:version'
+SEQUENCE_KEY = 'store:catalog:sequence'
+PRODUCT_VERSION_KEY = 'store:catalog:product:{}'
+CHANGED_AT_KEY = 'store:catalog:changed_at'
+
+# Stands in for the per-user CSRF token inside cached fragments
+CSRF_PLACEHOLDER = '__store_csrf_token__'
+
+
+class CacheStats:
+    """Process-wide hit/miss counters for the catalog cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        record_cache_access(hit)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _seeded(cache, keys):
+    """Values of ``keys``, seeding any that are gone from the clock"""
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        for key in keys:
+            if key not in found:
+                # Seeded from the clock so an evicted key never resurrects old entries
+                cache.add(key, time.time_ns(), timeout=None)
+        found = cache.get_many(keys)
+    return found
+
+
+async def _aseeded(cache, keys):
+    found = await cache.aget_many(keys)
+    if len(found) < len(keys):
+        for key in keys:
+            if key not in found:
+                await cache.aadd(key, time.time_ns(), timeout=None)
+        found = await cache.aget_many(keys)
+    return found
+
+
+def get_catalog_version():
+    """Get the current catalog version, initialising it if the key is gone"""
+    return _seeded(get_cache(), [VERSION_KEY])[VERSION_KEY]
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog entry"""
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    cache.set(CHANGED_AT_KEY, time.time_ns(), timeout=None)
+
+
+def bump_products(product_ids):
+    """Invalidate the cached entries that hold any of ``product_ids``"""
+    cache = get_cache()
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        sequence = time.time_ns()
+        cache.set(SEQUENCE_KEY, sequence, timeout=None)
+    cache.set_many({
+        CHANGED_AT_KEY: time.time_ns(),
+        **{PRODUCT_VERSION_KEY.format(pk): sequence for pk in product_ids},
+    }, timeout=None)
+
+
+def _recently_changed(stamps):
+    # An evicted stamp was seeded from the clock, so it reads as a change
+    return time.time_ns() - stamps[CHANGED_AT_KEY] < REPLICA_LAG * 1_000_000_000
+
+
+def _products(values):
+    # Products or values() rows, alone or in (nested) iterables
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, dict) or hasattr(value, 'pk'):
+            yield value
+        else:
+            yield from _products(value)
+
+
+def product_stamps(*values):
+    """(id, updated_at) of each product in ``values``, to key what is rendered from them"""
+    stamps = []
+    for product in _products(values):
+        if isinstance(product, dict):
+            stamps.append((product['id'], product['updated_at']))
+        else:
+            stamps.append((product.pk, product.updated_at))
+    return tuple(stamps)
+
+
+def _make_key(version, parts):
+    # Parts can carry raw query-string values, so hash them into a safe key
+    suffix = ':'.join('' if part is None else str(part) for part in parts)
+    digest = hashlib.md5(suffix.encode()).hexdigest()
+    return f'store:catalog:{version}:{parts[0]}:{digest}'
+
+
+def catalog_key(*parts):
+    """Build a cache key scoped to the current catalog version"""
+    return _make_key(get_catalog_version(), parts)
+
+
+def _dependency_keys(depends, value):
+    if depends is None:
+        return []
+    return [
+        PRODUCT_VERSION_KEY.format(product['id'] if isinstance(product, dict) else product.pk)
+        for product in _products([depends(value)])
+    ]
+
+
+def _is_current(entry, versions):
+    built_at, keys, _ = entry
+    # A product whose stamp was evicted may have changed since; assume it did
+    return all(versions.get(key, built_at + 1) <= built_at for key in keys)
+
+
+def get_or_set(parts, builder, timeout=None, depends=None):
+    """
+    Return the cached value for ``parts``, calling ``builder`` on a miss.
+
+    ``depends(value)`` returns the products (or values() rows) the value
+    holds; the entry is rebuilt once bump_products names any of them.
+    """
+    cache = get_cache()
+    stamps = _seeded(cache, [VERSION_KEY, SEQUENCE_KEY, CHANGED_AT_KEY])
+    key = _make_key(stamps[VERSION_KEY], parts)
+    entry = cache.get(key)
+    if entry is not None and _is_current(entry, cache.get_many(entry[1]) if entry[1] else {}):
+        stats.record(hit=True)
+        return entry[2]
+    stats.record(hit=False)
+    # The sequence was read before the builder reads the products, so a
+    # checkout that commits in between leaves the entry out of date
+    if _recently_changed(stamps):
+        with primary_reads():
+            value = builder()
+    else:
+        value = builder()
+    keys = _dependency_keys(depends, value)
+    if keys:
+        for missing in set(keys) - set(cache.get_many(keys)):
+            cache.add(missing, stamps[SEQUENCE_KEY], timeout=None)
+    cache.set(key, (stamps[SEQUENCE_KEY], keys, value), CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+async def aget_or_set(parts, builder, timeout=None, depends=None):
+    """Async version of get_or_set; ``builder`` is a coroutine function"""
+    cache = get_cache()
+    stamps = await _aseeded(cache, [VERSION_KEY, SEQUENCE_KEY, CHANGED_AT_KEY])
+    key = _make_key(stamps[VERSION_KEY], parts)
+    entry = await cache.aget(key)
+    if entry is not None and _is_current(entry, await cache.aget_many(entry[1]) if entry[1] else {}):
+        stats.record(hit=True)
+        return entry[2]
+    stats.record(hit=False)
+    if _recently_changed(stamps):
+        with primary_reads():
+            value = await builder()
+    else:
+        value = await builder()
+    keys = _dependency_keys(depends, value)
+    if keys:
+        for missing in set(keys) - set(await cache.aget_many(keys)):
+            await cache.aadd(missing, stamps[SEQUENCE_KEY], timeout=None)
+    await cache.aset(key, (stamps[SEQUENCE_KEY], keys, value), CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+def render_fragment(parts, render, csrf_token=None, showing=()):
+    """
+    Return cached HTML for ``parts``, producing it with ``render`` on a miss.
+
+    ``showing`` are the products (or values() rows) the fragment shows; the
+    fragment is rendered again once any of them changes. ``render`` must
+    emit CSRF_PLACEHOLDER wherever a token belongs; it is swapped for the
+    caller's ``csrf_token`` on every request.
+    """
+    html = get_or_set((*parts, product_stamps(showing)), render)
+    if csrf_token and csrf_token != 'NOTPROVIDED':
+        html = html.replace(CSRF_PLACEHOLDER, str(csrf_token))
+    return html
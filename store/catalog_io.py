@@ -0,0 +1,294 @@
+"""
+Streaming catalog import and export.
+
+Feeds are CSV files with a header row, or JSON lines, with one product per
+row. The ``slug``, ``name``, ``category`` and ``price`` columns are
+required. ``category_name``, ``description``, ``stock``, ``available`` and
+``image`` are optional. Only the optional columns present in the first row
+are written, so a feed without ``stock`` leaves the stock of existing
+products alone.
+
+``category`` is a category slug. A slug that does not exist yet creates the
+category, named ``category_name`` or after the slug. ``image`` is the name
+of a file already in media storage, as ``export_rows`` writes it.
+
+``import_catalog`` reads, validates and upserts ``batch_size`` rows at a
+time. Each chunk runs in its own transaction, with one
+INSERT ... ON CONFLICT (slug) DO UPDATE, so memory use does not grow with
+the feed. Category slugs resolve through a dict of every category, loaded
+once. Bulk writes send no save signals, so the import then rebuilds the
+search index, bumps the catalog cache and reloads the category registry
+itself.
+"""
+import csv
+import json
+import logging
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .catalog_cache import bump_catalog_version
+from .category_registry import category_registry
+from .images import refresh_variants
+from .models import Category, Product
+from .search import rebuild_index
+
+FORMATS = ('csv', 'jsonl')
+REQUIRED_COLUMNS = ('slug', 'name', 'category', 'price')
+OPTIONAL_COLUMNS = ('category_name', 'description', 'stock', 'available', 'image')
+EXPORT_COLUMNS = (
+    'slug', 'name', 'category', 'category_name', 'description', 'price', 'stock', 'available', 'image',
+)
+# Product fields a feed column may set, in the order they are written
+PRODUCT_FIELDS = ('slug', 'name', 'description', 'price', 'stock', 'available', 'image')
+MAX_REPORTED_ERRORS = 20
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def feed_format(path, fmt=None):
+    """``fmt``, or the format implied by the extension of ``path``"""
+    if fmt:
+        return fmt
+    for candidate in FORMATS:
+        if str(path).lower().endswith(f'.{candidate}'):
+            return candidate
+    if str(path).lower().endswith('.json'):
+        return 'jsonl'
+    raise ValueError(f'Cannot tell the format of {path}; pass --format.')
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row) from a CSV or JSON-lines text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def parse_row(row, columns):
+    """(category slug, category name, product field values) of one row; raises InvalidRow"""
+    if not isinstance(row, dict):
+        raise InvalidRow('not a JSON object')
+    values = {}
+    for column in columns:
+        value = row.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ''):
+            if column in REQUIRED_COLUMNS:
+                raise InvalidRow(f'{column} is required')
+            value = None if column == 'category_name' else ''
+        values[column] = value
+
+    fields = {}
+    for column in PRODUCT_FIELDS:
+        if column not in values:
+            continue
+        value = values[column]
+        field = Product._meta.get_field(column)
+        if column == 'image':
+            fields[column] = str(value)
+            continue
+        if value == '':
+            # Optional and left empty
+            fields[column] = field.get_default()
+            continue
+        try:
+            fields[column] = field.clean(value, None)
+        except ValidationError as e:
+            raise InvalidRow(f"{column}: {' '.join(e.messages)}")
+    return str(values['category']), values.get('category_name'), fields
+
+
+class _Categories:
+    """Every category's id by slug and slug by name, creating missing ones on demand"""
+
+    def __init__(self):
+        self.ids = {}
+        self.slugs = {}
+        for category_id, slug, name in Category.objects.order_by().values_list('id', 'slug', 'name'):
+            self.ids[slug] = category_id
+            self.slugs[name] = slug
+        self.named = set()
+
+    def check(self, slug, name):
+        """Raise InvalidRow when upserting would give category ``slug`` another category's name"""
+        if slug in self.ids and not (name and slug not in self.named):
+            return
+        name = name or self.default_name(slug)
+        taken_by = self.slugs.setdefault(name, slug)
+        if taken_by != slug:
+            raise InvalidRow(f'category name {name!r} belongs to category {taken_by!r}')
+
+    @staticmethod
+    def default_name(slug):
+        return slug.replace('-', ' ').replace('_', ' ').title()
+
+    def upsert(self, names):
+        """
+        Create the categories of ``names``, {slug: name or None}, that are
+        missing and rename existing ones to a given name, once per import
+        """
+        pending = {
+            slug: name or self.default_name(slug)
+            for slug, name in names.items()
+            if slug not in self.ids or (name and slug not in self.named)
+        }
+        if not pending:
+            return
+        upserted = Category.objects.bulk_create(
+            [Category(slug=slug, name=name) for slug, name in pending.items()],
+            update_conflicts=True, unique_fields=['slug'], update_fields=['name', 'updated_at'],
+        )
+        if any(category.pk is None for category in upserted):
+            # The backend cannot return ids from an upsert
+            upserted = Category.objects.filter(slug__in=pending).order_by()
+        for category in upserted:
+            self.ids[category.slug] = category.pk
+            self.slugs[category.name] = category.slug
+        self.named.update(slug for slug in pending if names[slug])
+
+
+def _import_chunk(chunk, columns, categories):
+    # chunk: {product slug: (category slug, category name, fields)}, last row wins
+    update_fields = ['category', *[c for c in PRODUCT_FIELDS if c in columns and c != 'slug'], 'updated_at']
+    with transaction.atomic():
+        names = {}
+        for category, name, _ in chunk.values():
+            if name or category not in names:
+                names[category] = name
+        categories.upsert(names)
+        existing = dict(
+            Product.objects.filter(slug__in=chunk).order_by().values_list('slug', 'image_variants')
+        )
+        products = Product.objects.bulk_create(
+            [Product(category_id=categories.ids[category], **fields) for category, _, fields in chunk.values()],
+            update_conflicts=True, unique_fields=['slug'], update_fields=update_fields,
+        )
+
+    stale = []
+    if 'image' in columns:
+        for product in products:
+            source = (existing.get(product.slug) or {}).get('source', '')
+            if (product.image.name or '') != source:
+                stale.append(product.pk)
+    return len(chunk) - len(existing), len(existing), stale
+
+
+def import_catalog(rows, batch_size=1000, on_chunk=None):
+    """
+    Upsert products, and the categories they name, from ``rows`` as
+    yielded by read_rows.
+
+    ``on_chunk(totals, stale_ids)`` is called after each chunk commits, with
+    the running totals and the ids of products whose image changed.
+    Returns the totals: rows, created, updated, skipped and the first
+    MAX_REPORTED_ERRORS errors as (line number, message).
+    """
+    totals = {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+    categories = _Categories()
+    columns = None
+    chunk = {}
+
+    def flush():
+        created, updated, stale = _import_chunk(chunk, columns, categories)
+        totals['created'] += created
+        totals['updated'] += updated
+        chunk.clear()
+        if on_chunk:
+            on_chunk(totals, stale)
+
+    for number, row in rows:
+        totals['rows'] += 1
+        if columns is None and isinstance(row, dict):
+            columns = [*REQUIRED_COLUMNS, *(column for column in OPTIONAL_COLUMNS if column in row)]
+        try:
+            category, name, fields = parse_row(row, columns or REQUIRED_COLUMNS)
+            categories.check(category, name)
+        except InvalidRow as e:
+            totals['skipped'] += 1
+            if len(totals['errors']) < MAX_REPORTED_ERRORS:
+                totals['errors'].append((number, str(e)))
+            continue
+        # A slug repeated within one statement would be updated twice
+        chunk.pop(fields['slug'], None)
+        chunk[fields['slug']] = (category, name, fields)
+        if len(chunk) >= batch_size:
+            flush()
+    if chunk:
+        flush()
+
+    if totals['created'] or totals['updated']:
+        rebuild_index()
+        bump_catalog_version()
+        category_registry.invalidate()
+    return totals
+
+
+def build_image_variants(product_ids):
+    """Refresh the image variants of ``product_ids``; returns how many were rebuilt"""
+    built = 0
+    for product in Product.objects.filter(id__in=product_ids):
+        try:
+            built += refresh_variants(product)
+        except OSError as e:
+            # A feed may name files that were never uploaded
+            logger.warning('Cannot build variants for %s: %s', product.image.name, e)
+    return built
+
+
+def export_rows(batch_size=2000):
+    """Yield every product as a dict of EXPORT_COLUMNS, in id order"""
+    categories = {
+        category_id: (slug, name)
+        for category_id, slug, name in Category.objects.order_by().values_list('id', 'slug', 'name')
+    }
+    products = Product.objects.order_by('id').values_list(
+        'category_id', 'slug', 'name', 'description', 'price', 'stock', 'available', 'image',
+    )
+    for category_id, slug, name, description, price, stock, available, image in products.iterator(
+        chunk_size=batch_size,
+    ):
+        category, category_name = categories[category_id]
+        yield {
+            'slug': slug,
+            'name': name,
+            'category': category,
+            'category_name': category_name,
+            'description': description,
+            'price': price,
+            'stock': stock,
+            'available': available,
+            'image': image or '',
+        }
+
+
+def write_rows(stream, fmt, rows):
+    """Write ``rows`` to a text stream as CSV or JSON lines; returns the row count"""
+    written = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, EXPORT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+        return written
+    for row in rows:
+        stream.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        written += 1
+    return written
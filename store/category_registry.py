@@ -0,0 +1,74 @@
+import threading
+import time
+
+from .catalog_cache import get_cache
+from .models import Category
+
+
+VERSION_KEY = 'store:categories:version'
+
+
+class CategoryRegistry:
+    """
+    Process-level, lazily loaded index of categories by slug.
+
+    The registry remembers the version stamp it was loaded at and compares
+    it with the stamp in the catalog cache on each access. That cache must
+    be shared between processes (production settings use Redis or the
+    file-based cache, and the store.E001 deploy check rejects LocMem), so
+    a category change in any worker, run_worker or management command
+    reloads every worker's copy. In steady state a lookup costs one cache
+    read and no database queries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (version, categories, by slug, by id), swapped in one assignment
+        self._state = (None, [], {}, {})
+
+    def _current_version(self):
+        cache = get_cache()
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _load(self):
+        version = self._current_version()
+        if version == self._state[0]:
+            return self._state
+        with self._lock:
+            if version != self._state[0]:
+                # Never from a replica: a lagging one would leave out a new
+                # category until the next category write
+                categories = list(Category.objects.using('default'))
+                by_slug = {category.slug: category for category in categories}
+                by_id = {category.id: category for category in categories}
+                self._state = (version, categories, by_slug, by_id)
+            return self._state
+
+    def all(self):
+        """All categories in Category.Meta.ordering"""
+        return self._load()[1]
+
+    def get(self, slug):
+        """The category with ``slug``, or None"""
+        return self._load()[2].get(slug)
+
+    def get_by_id(self, category_id):
+        """The category with primary key ``category_id``, or None"""
+        return self._load()[3].get(category_id)
+
+    def invalidate(self):
+        """Force every process to reload on its next access"""
+        cache = get_cache()
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        with self._lock:
+            self._state = (None, [], {}, {})
+
+
+category_registry = CategoryRegistry()
@@ -2,35 +2,27 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.core.paginator import Paginator
 from decimal import Decimal
-from .models import Order, OrderItem, Product
-from .cart_views import get_cart, save_cart
+from .models import Order
+from .cart import shipping_cost_for
+from .cart_storage import get_cart_storage
+from .cart_views import get_cart_lines
+from .instrumentation import query_budget, span, trace
+from .inventory import place_order
 import logging
 
 logger = logging.getLogger(__name__)
 
+ORDERS_PER_PAGE = 10
+
 
 def get_cart_items(request):
     """Get validated cart items with fresh product data"""
-    cart = get_cart(request)
-    cart_items = []
-    
-    for product_id, item in cart.items():
-        try:
-            product = Product.objects.get(id=int(product_id))
-            if product.available and product.stock > 0:
-                cart_items.append({
-                    'product': product,
-                    'quantity': item['quantity'],
-                    'price': item['price'],
-                })
-        except Product.DoesNotExist:
-            logger.warning(f"Product {product_id} not found in cart")
-    
-    return cart_items
+    return get_cart_lines(request)
 
 
+@query_budget(15)
 @login_required
 def checkout(request):
     """Checkout page"""
@@ -41,69 +33,49 @@ def checkout(request):
         return redirect('store:cart')
     
     # Calculate total
-    total_price = sum(Decimal(str(item['price'])) * item['quantity'] for item in cart_items)
+    total_price = sum((item.item_total for item in cart_items), Decimal('0.00'))
     
     # Add shipping cost
-    shipping_cost = Decimal('0.00') if total_price >= Decimal('50.00') else Decimal('5.99')
+    shipping_cost = shipping_cost_for(total_price)
     final_total = total_price + shipping_cost
     
     if request.method == 'POST':
         try:
-            print(f"DEBUG: User authenticated: {request.user.is_authenticated}")
-            print(f"DEBUG: User: {request.user}")
+            trace('checkout.submit', user_id=request.user.pk, lines=len(cart_items), subtotal=total_price)
             
             # Check if user is still authenticated
             if not request.user.is_authenticated:
                 messages.error(request, 'You must be logged in to place an order.')
                 return redirect('login')
             
-            # Create order
-            order = Order.objects.create(
-                user=request.user,
-                first_name=request.POST.get('first_name'),
-                last_name=request.POST.get('last_name'),
-                email=request.POST.get('email'),
-                address=request.POST.get('address'),
-                postal_code=request.POST.get('postal_code'),
-                city=request.POST.get('city'),
-                paid=False,
-                status='pending'
-            )
-            
-            print(f"DEBUG: Order created: {order.id}")
-            
-            # Create order items
-            for item in cart_items:
-                product = Product.objects.get(id=item['product'].id)
-                
-                if product.stock < item['quantity']:
-                    order.delete()
-                    raise ValidationError(f'Only {product.stock} items available for {product.name}')
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    price=item['price'],
-                    quantity=item['quantity']
+            # Create order and reserve stock in one transaction
+            with span('place_order'):
+                order = place_order(
+                    request.user,
+                    cart_items,
+                    first_name=request.POST.get('first_name'),
+                    last_name=request.POST.get('last_name'),
+                    email=request.POST.get('email'),
+                    address=request.POST.get('address'),
+                    postal_code=request.POST.get('postal_code'),
+                    city=request.POST.get('city'),
+                    paid=False,
+                    status='pending'
                 )
-                
-                product.stock -= item['quantity']
-                product.save()
+            
+            trace('checkout.order_created', order_id=order.id, total=order.total)
             
             # Clear cart
-            request.session['cart'] = {}
-            request.session.modified = True
+            get_cart_storage(request).clear()
             
-            print(f"DEBUG: About to redirect to order confirmation for order {order.id}")
             messages.success(request, f'Order #{order.id} placed successfully!')
             return redirect('store:order_confirmation', order_id=order.id)
                 
         except ValidationError as e:
-            print(f"DEBUG: Validation error: {e}")
+            trace('checkout.rejected', reason=str(e))
             messages.error(request, str(e))
         except Exception as e:
-            print(f"DEBUG: Exception: {e}")
-            logger.error(f"Checkout error: {e}")
+            logger.exception(f"Checkout error: {e}")
             messages.error(request, 'An error occurred while processing your order. Please try again.')
     
     # Pre-fill form with user data if available
@@ -125,6 +97,7 @@ def checkout(request):
     return render(request, 'store/checkout.html', context)
 
 
+@query_budget(8)
 @login_required
 def order_confirmation(request, order_id):
     """Order confirmation page"""
@@ -138,12 +111,19 @@ def order_confirmation(request, order_id):
     return render(request, 'store/order_confirmation.html', context)
 
 
+@query_budget(8)
 @login_required
 def order_history(request):
     """View order history"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = (
+        Order.objects.filter(user=request.user)
+        .prefetch_related('items__product')
+        .order_by('-created_at')
+    )
+    page_obj = Paginator(orders, ORDERS_PER_PAGE).get_page(request.GET.get('page'))
     
     context = {
-        'orders': orders,
+        'orders': page_obj,
+        'page_obj': page_obj,
     }
     return render(request, 'store/order_history.html', context)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .catalog_cache import CACHE_ALIAS
+
+# Backends whose entries no other process can see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_catalog_cache(app_configs, **kwargs):
+    """The catalog cache and category registry invalidations must reach every worker"""
+    backend = settings.CACHES.get(CACHE_ALIAS, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'The {CACHE_ALIAS!r} cache ({backend}) is not shared between processes.',
+        hint='Catalog and category changes made by one gunicorn worker, run_worker or a '
+             'management command would never reach the others, which would keep serving stale '
+             'pages and 404 for new categories. Set REDIS_URL, or CACHE_DIR when every process '
+             'runs on one machine.',
+        id='store.E001',
+    )]
@@ -0,0 +1,100 @@
+"""
+Conditional GET for the HTML product pages.
+
+A product page is built from catalog rows (the product, its category, its
+recommendations and the category menu) plus a little visitor state: who is signed in, the cart
+badge and the CSRF cookie its forms are tied to. ``page_validators`` turns
+both into a strong ETag, and the catalog rows into a Last-Modified. The
+ETag also hashes ``STORE_ETAG_SALT``, so a deploy that changes templates
+can retire every page browsers hold by changing the salt. It
+works from rows the view has already loaded through the catalog cache and
+the category registry, so revalidating a page costs at most the one query
+that loads the product. A match is answered with 304 before the template
+is rendered.
+
+Last-Modified is only sent when the page holds nothing visitor-specific,
+since If-Modified-Since cannot tell a signed-in visitor's page from an
+anonymous one. Crawlers, which revalidate by date, are anonymous.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .cart_storage import get_cart_storage
+
+# How long a browser may reuse a quick view fragment without asking again
+QUICKVIEW_MAX_AGE = getattr(settings, 'STORE_QUICKVIEW_MAX_AGE', 30)
+
+# Cache-Control per kind of response. Full pages show the cart badge, which
+# changes without the URL changing, so they are always revalidated.
+# Fragments embed a CSRF token, so only the visitor's own browser keeps them.
+CACHE_POLICIES = {
+    'page': {'no_cache': True},
+    'fragment': {'private': True, 'max_age': QUICKVIEW_MAX_AGE},
+}
+
+
+def visitor_state(request):
+    """
+    The visitor-specific inputs of a full page, or None when the page has to
+    be rendered anyway because flash messages are waiting to be shown
+    """
+    # Loads the user here too, so async views can read it afterwards
+    user_id = request.user.pk
+    # len() does not mark the messages as shown, unlike iterating them
+    if len(messages.get_messages(request)):
+        return None
+    return (user_id, get_cart_storage(request).count(), csrf_cookie(request))
+
+
+def csrf_cookie(request):
+    """
+    The CSRF cookie the page's forms are tied to; always last in a visitor
+    state. A browser's first visit is tagged before the cookie exists, so
+    its second visit renders once more; cookieless crawlers always match.
+    """
+    return request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+
+
+def page_validators(product, categories=(), visitor=(), related=()):
+    """
+    Return (etag, last_modified) for a page showing ``product``, the
+    ``related`` products and the ``categories`` menu to ``visitor``;
+    last_modified is None when the page varies by visitor
+    """
+    catalog = [(product.id, product.updated_at), (product.category_id, product.category.updated_at)]
+    catalog += [(category.id, category.updated_at) for category in categories]
+    catalog += [(item.id, item.updated_at) for item in related]
+    digest = hashlib.sha1(repr((settings.STORE_ETAG_SALT, catalog, visitor)).encode()).hexdigest()
+
+    last_modified = None
+    # Everything but the CSRF cookie makes the page visitor-specific
+    if not any(visitor[:-1]):
+        last_modified = int(max(updated_at for _, updated_at in catalog).timestamp())
+    return f'"{digest}"', last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response if the request's validators match, otherwise None"""
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def add_cache_headers(request, response, policy, etag=None, last_modified=None, vary=()):
+    """Apply the ``policy`` Cache-Control, validators and Vary to ``response``"""
+    if etag is not None and response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+    directives = dict(CACHE_POLICIES[policy])
+    if policy == 'page':
+        # Shared caches may keep anonymous pages; Vary: Cookie keeps them
+        # apart. Async views must have loaded request.user (visitor_state does)
+        directives['private' if request.user.is_authenticated else 'public'] = True
+    patch_cache_control(response, **directives)
+    patch_vary_headers(response, ('Cookie', *vary))
+    return response
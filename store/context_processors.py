@@ -1,11 +1,12 @@
+from .cart_storage import get_cart_storage
+from .category_registry import category_registry
+
+
 def cart_count(request):
     """Add cart count to all templates"""
-    cart = request.session.get('cart', {})
-    if not isinstance(cart, dict):
-        cart = {}
-    
-    cart_count = 0
-    for item in cart.values():
-        cart_count += item.get('quantity', 0)
-    
-    return {'cart_count': cart_count}
\ No newline at end of file
+    return {'cart_count': get_cart_storage(request).count()}
+
+
+def categories(request):
+    """Add the memoized category list to all templates"""
+    return {'categories': category_registry.all()}
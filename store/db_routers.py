@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_primary_reads = ContextVar('store_primary_reads', default=False)
+
+
+@contextmanager
+def primary_reads():
+    """Send the catalog reads made inside the block to the primary"""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Read the catalog (categories and products) from a replica database.
+
+    Everything else, and every write, goes to ``default``. Inside a
+    transaction on ``default`` catalog reads stay there too, so checkout's
+    ``select_for_update`` locks the primary rows it is about to decrement;
+    so do reads inside ``primary_reads()``, which the catalog cache uses to
+    rebuild entries just after a change the replica may not have yet.
+    Installed by settings_production when DATABASE_REPLICA_URL is set.
+    """
+
+    replica_alias = getattr(settings, 'STORE_REPLICA_DATABASE', 'replica')
+    catalog_models = {('store', 'category'), ('store', 'product')}
+
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label, model._meta.model_name) not in self.catalog_models:
+            return None
+        if self.replica_alias not in settings.DATABASES:
+            return None
+        if connections['default'].in_atomic_block or _primary_reads.get():
+            return 'default'
+        return self.replica_alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica mirrors the primary, so rows from either may be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != self.replica_alias
@@ -0,0 +1,180 @@
+"""
+Responsive derivatives of product images.
+
+When a product image changes (see store.signals) or the
+``build_image_variants`` command runs, the source is resized to each of
+STORE_IMAGE_WIDTHS and encoded as AVIF, WebP and JPEG, skipping any format
+the installed Pillow cannot write. The result is recorded on
+``Product.image_variants``::
+
+    {'source': 'products/lamp.jpg', 'width': 1600, 'height': 1200,
+     'formats': {'avif': [[160, 'products/variants/lamp-160w.avif'], ...],
+                 'webp': [...], 'jpeg': [...]}}
+
+SVG sources are vector already, so they are minified once and served as
+``{'source': ..., 'svg': 'products/variants/logo.svg'}``. The
+``product_image`` template tag turns either form into markup.
+"""
+import io
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .catalog_cache import bump_products
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+IMAGE_WIDTHS = tuple(sorted(getattr(settings, 'STORE_IMAGE_WIDTHS', (160, 320, 640, 1024))))
+IMAGE_QUALITY = getattr(settings, 'STORE_IMAGE_QUALITY', 80)
+VARIANTS_DIR = 'products/variants'
+
+# Most compact first; ``<source>`` order tells browsers which to prefer
+OUTPUT_FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+FALLBACK_FORMAT = 'jpeg'
+
+_SVG_COMMENT = re.compile(rb'<!--.*?-->', re.DOTALL)
+_SVG_METADATA = re.compile(rb'<metadata\b.*?</metadata>', re.DOTALL | re.IGNORECASE)
+_SVG_BETWEEN_TAGS = re.compile(rb'>\s+<')
+_SVG_WHITESPACE = re.compile(rb'\s+')
+
+
+def encodable_formats():
+    """Names from OUTPUT_FORMATS that this Pillow build can write"""
+    return [name for name in OUTPUT_FORMATS if name == FALLBACK_FORMAT or features.check(name)]
+
+
+def is_svg(name):
+    return os.path.splitext(name)[1].lower() == '.svg'
+
+
+def optimize_svg(data):
+    """Strip comments, metadata and redundant whitespace from SVG markup"""
+    data = _SVG_COMMENT.sub(b'', data)
+    data = _SVG_METADATA.sub(b'', data)
+    data = _SVG_BETWEEN_TAGS.sub(b'><', data)
+    return _SVG_WHITESPACE.sub(b' ', data).strip()
+
+
+def variant_names(variants):
+    """Every stored file referenced by an ``image_variants`` record"""
+    names = [name for entries in variants.get('formats', {}).values() for _, name in entries]
+    if variants.get('svg'):
+        names.append(variants['svg'])
+    return names
+
+
+def variants_stale(product):
+    """True when the recorded variants were not built from the current image"""
+    return (product.image_variants or {}).get('source', '') != (product.image.name or '')
+
+
+def _encode(image, fmt):
+    pil_format = OUTPUT_FORMATS[fmt][0]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG has no alpha channel, so flatten onto white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, quality=IMAGE_QUALITY, **({'optimize': True} if fmt == 'jpeg' else {}))
+    return buffer.getvalue()
+
+
+def build_variants(product):
+    """Write derivatives of ``product.image`` and return their record"""
+    storage = product.image.storage
+    name = product.image.name
+    stem = os.path.splitext(os.path.basename(name))[0]
+
+    with product.image.open('rb') as source:
+        data = source.read()
+
+    if is_svg(name):
+        svg_name = storage.save(f'{VARIANTS_DIR}/{stem}.svg', ContentFile(optimize_svg(data)))
+        return {'source': name, 'svg': svg_name}
+
+    try:
+        with Image.open(io.BytesIO(data)) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('Cannot build variants for %s: %s', name, e)
+        # Recorded anyway so the image is not retried on every save
+        return {'source': name}
+
+    width, height = image.size
+    # Never upscale; the widest variant is the source itself, capped
+    widths = sorted({w for w in IMAGE_WIDTHS if w < width} | {min(width, IMAGE_WIDTHS[-1])})
+
+    formats = {fmt: [] for fmt in encodable_formats()}
+    for target in widths:
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS,
+        )
+        for fmt, entries in formats.items():
+            saved = storage.save(f'{VARIANTS_DIR}/{stem}-{target}w.{fmt}', ContentFile(_encode(resized, fmt)))
+            entries.append([target, saved])
+
+    return {'source': name, 'width': width, 'height': height, 'formats': formats}
+
+
+def refresh_variants(product, force=False):
+    """
+    Rebuild the derivatives of ``product`` if its image changed.
+
+    Returns True when anything was rebuilt or cleared. The record is written
+    with an UPDATE so no save signals fire again; it moves ``updated_at`` on
+    so page ETags change, and once it commits the product's cached entries
+    are invalidated and only then are the old files deleted, so no page
+    still pointing at them is served from the cache.
+    """
+    if not force and not variants_stale(product):
+        return False
+
+    old_names = variant_names(product.image_variants or {})
+    # Built while the old files still exist, so a rebuild gets new names
+    variants = build_variants(product) if product.image else {}
+    product.image_variants = variants
+    product.updated_at = timezone.now()
+    Product.objects.filter(pk=product.pk).update(image_variants=variants, updated_at=product.updated_at)
+
+    storage = product.image.storage
+    unused = set(old_names) - set(variant_names(variants))
+
+    def retire():
+        bump_products([product.pk])
+        for name in unused:
+            storage.delete(name)
+
+    transaction.on_commit(retire)
+    return True
+
+
+def srcset(product, fmt):
+    """``srcset`` value listing every width of ``fmt`` for ``product``"""
+    storage = product.image.storage
+    entries = product.image_variants.get('formats', {}).get(fmt, [])
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in entries)
+
+
+def fallback_url(product, width=None):
+    """URL of the smallest JPEG variant at least ``width`` wide"""
+    entries = (product.image_variants or {}).get('formats', {}).get(FALLBACK_FORMAT)
+    if not entries:
+        return product.image.url
+    chosen = entries[-1]
+    if width:
+        chosen = next((entry for entry in entries if entry[0] >= width), chosen)
+    return product.image.storage.url(chosen[1])
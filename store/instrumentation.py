@@ -0,0 +1,304 @@
+"""
+Per-request performance instrumentation.
+
+RequestMetricsMiddleware opens a RequestMetrics for every request and makes
+it current through a context variable, which also follows the request into
+``sync_to_async`` threads. While it is current:
+
+* every SQL query is counted and timed by an execute wrapper installed on
+  each database connection as it is opened,
+* InstrumentedTemplates times top-level template renders,
+* the catalog cache reports its hits and misses,
+* ``span()`` and ``trace()`` record named timings and events.
+
+When the response is ready the totals are sent as a ``Server-Timing`` header
+(if STORE_SERVER_TIMING is on), logged as one JSON line on the
+``store.requests`` logger (a capture the ``replay`` command can play
+back) and added to ``view_stats``, which keeps rolling
+latency percentiles per view. A view declares its query budget with
+``@query_budget(n)``; going over it logs a warning, or raises
+QueryBudgetExceeded when STORE_QUERY_BUDGET_STRICT is set, as it is under
+the test runner.
+"""
+import contextvars
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('store.requests')
+trace_logger = logging.getLogger('store.trace')
+
+
+STATS_WINDOW = getattr(settings, 'STORE_METRICS_WINDOW', 500)
+
+_current = contextvars.ContextVar('store_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view runs more queries than its budget allows"""
+
+
+class RequestMetrics:
+    """Counters for a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.spans = []
+        self.events = []
+        self.query_budget = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        entries = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+        ]
+        entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.spans]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current_metrics():
+    """The RequestMetrics of the request being handled, or None"""
+    return _current.get()
+
+
+# Collection hooks
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def instrument_connection(connection):
+    # First in line, so an enclosing connection.execute_wrapper() block
+    # still pops its own wrapper on exit
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+@receiver(connection_created)
+def _instrument_new_connection(sender, connection, **kwargs):
+    instrument_connection(connection)
+
+
+def record_cache_access(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as a named entry of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.spans.append((name, time.perf_counter() - started))
+
+
+@contextmanager
+def detached():
+    """Leave the enclosed block's queries and timings out of the current request"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def trace(event, **fields):
+    """Log a structured event and attach its name to the current request"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.events.append(event)
+    if trace_logger.isEnabledFor(logging.DEBUG):
+        trace_logger.debug(
+            '%s %s', event, json.dumps(fields, default=str, sort_keys=True),
+            extra={'event': event, 'fields': fields},
+        )
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # Only the outermost render counts, so nested render_to_string calls
+        # are not added twice
+        if metrics is None or metrics.template_depth:
+            return super().render(context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """The Django template backend, with render time reported per request"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# Aggregation
+
+def query_budget(limit):
+    """Declare the most SQL queries a request to the decorated view may run"""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def percentile(ordered, pct):
+    """Nearest-rank ``pct`` percentile of an already sorted, non-empty list"""
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class ViewStats:
+    """Rolling window of recent latencies and query counts per view"""
+
+    def __init__(self, window=STATS_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, view_name, seconds, queries):
+        with self._lock:
+            self._samples[view_name].append((seconds, queries))
+
+    def snapshot(self):
+        with self._lock:
+            samples = {view: list(window) for view, window in self._samples.items()}
+        report = {}
+        for view, window in sorted(samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _ in window)
+            queries = sorted(count for _, count in window)
+            report[view] = {
+                'count': len(window),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'queries_p50': percentile(queries, 50),
+                'queries_max': queries[-1],
+            }
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+view_stats = ViewStats()
+
+
+class RequestMetricsMiddleware:
+    """Measure every request; place it first in MIDDLEWARE to include the others"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            instrument_connection(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.query_budget = getattr(view_func, 'query_budget', None)
+
+    def finish(self, request, response, metrics):
+        elapsed = metrics.elapsed()
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        view_stats.record(view_name, elapsed, metrics.queries)
+
+        if logger.isEnabledFor(logging.INFO):
+            payload = {
+                'ts': round(time.time(), 3),
+                'method': request.method,
+                # With the query string, so replay.py repeats the same request
+                'path': request.get_full_path(),
+                'view': view_name,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'queries': metrics.queries,
+                'db_ms': round(metrics.db_time * 1000, 2),
+                'template_ms': round(metrics.template_time * 1000, 2),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'spans': {name: round(seconds * 1000, 2) for name, seconds in metrics.spans},
+                'events': metrics.events,
+            }
+            logger.info(json.dumps(payload), extra={'request_metrics': payload})
+
+        if getattr(settings, 'STORE_SERVER_TIMING', settings.DEBUG):
+            response.headers['Server-Timing'] = metrics.server_timing(elapsed)
+
+        budget = metrics.query_budget
+        if budget is not None and metrics.queries > budget:
+            message = f'{view_name} ran {metrics.queries} queries, over its budget of {budget}'
+            if getattr(settings, 'STORE_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
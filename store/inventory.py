@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.db.models.functions import Now
+
+from .cart import shipping_cost_for
+from .catalog_cache import bump_products
+from .models import Order, OrderItem, Product
+from .rollups import order_snapshot
+from .tasks import record_co_purchases, record_order_sales
+
+
+class InsufficientStock(ValidationError):
+    """Raised when a cart line asks for more units than are in stock"""
+
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(f'Only {available} items available for {product.name}')
+
+
+def place_order(user, cart_items, **order_fields):
+    """
+    Create an order for ``cart_items`` and reserve its stock atomically.
+
+    Product rows are locked in id order so concurrent checkouts cannot
+    deadlock, stock is decremented for every line in one conditional
+    UPDATE, and order items are inserted with a single bulk_create. Raises
+    InsufficientStock (rolling everything back) if any line cannot be
+    fulfilled. The order totals are stored on the row as it is created;
+    the sales rollups and the co-purchase counts behind recommendations
+    are queued for a worker once the order commits.
+    """
+    quantities = {}
+    prices = {}
+    for item in cart_items:
+        quantities[item.product.id] = quantities.get(item.product.id, 0) + item.quantity
+        prices[item.product.id] = item.price
+    product_ids = sorted(quantities)
+
+    with transaction.atomic():
+        products = list(
+            Product.objects.select_for_update().filter(id__in=product_ids).order_by('id')
+        )
+        for product in products:
+            if not product.available or product.stock < quantities[product.id]:
+                raise InsufficientStock(product, product.stock if product.available else 0)
+        if len(products) != len(product_ids):
+            raise ValidationError('Some products in your cart are no longer available.')
+
+        # The stock__gte guard keeps the decrement safe even on backends
+        # that ignore select_for_update (SQLite)
+        in_stock = Q()
+        for product_id, quantity in quantities.items():
+            in_stock |= Q(id=product_id, stock__gte=quantity)
+        updated = Product.objects.filter(in_stock).update(
+            stock=Case(
+                *(When(id=product_id, then=F('stock') - quantity)
+                  for product_id, quantity in quantities.items()),
+                default=F('stock'),
+                output_field=PositiveIntegerField(),
+            ),
+            # Keeps the catalog API's ETag and Last-Modified honest
+            updated_at=Now(),
+        )
+        if updated != len(product_ids):
+            # Another checkout took the stock between our read and write
+            raise ValidationError('Some items in your cart just sold out. Please review your cart.')
+
+        subtotal = sum(
+            (prices[product_id] * quantity for product_id, quantity in quantities.items()),
+            Decimal('0.00'),
+        )
+        shipping_cost = shipping_cost_for(subtotal)
+        order = Order.objects.create(
+            user=user,
+            subtotal=subtotal,
+            shipping_cost=shipping_cost,
+            total=subtotal + shipping_cost,
+            item_count=sum(quantities.values()),
+            **order_fields,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=product,
+                price=prices[product.id],
+                quantity=quantities[product.id],
+            )
+            for product in products
+        ])
+        record_order_sales.enqueue(order_snapshot(order, [
+            (product.id, product.category_id, quantities[product.id], prices[product.id])
+            for product in products
+        ]))
+        record_co_purchases.enqueue(product_ids)
+        # Queryset updates skip model signals, so refresh cached stock levels
+        # here, for the products bought only
+        transaction.on_commit(lambda: bump_products(product_ids))
+    return order
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Sum
+
+from store.cart import shipping_cost_for
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized subtotal, shipping, total and item count of every order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of orders updated per query (default: 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = Order.objects.order_by('id').annotate(
+            items_subtotal=Sum(F('items__price') * F('items__quantity')),
+            items_count=Sum('items__quantity'),
+        )
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(orders.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for order in batch:
+                order.subtotal = order.items_subtotal or Decimal('0.00')
+                order.item_count = order.items_count or 0
+                order.shipping_cost = shipping_cost_for(order.subtotal) if order.item_count else Decimal('0.00')
+                order.total = order.subtotal + order.shipping_cost
+            Order.objects.bulk_update(batch, ['subtotal', 'shipping_cost', 'total', 'item_count'])
+            updated += len(batch)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'Updated totals for {updated} orders.'))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily, product, category and order status sales rollups from every order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rollup rows inserted per statement (default: 1000)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = backfill(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        rows = ', '.join(f'{count} {name}' for name, count in written.items())
+        self.stdout.write(self.style.SUCCESS(f'Stored {rows} rows in {elapsed:.2f}s.'))
@@ -0,0 +1,117 @@
+import json
+import platform
+import time
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from store.benchmark import SCENARIOS, compare_reports, run_scenario, seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic catalog in a throwaway test database, time the storefront '
+        'hot paths and write latency, query and memory figures as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000,
+                            help='Catalog size, e.g. 1000, 10000 or 100000 (default: 1000)')
+        parser.add_argument('--categories', type=int, default=20,
+                            help='Number of categories (default: 20)')
+        parser.add_argument('--users', type=int, default=5,
+                            help='Number of shoppers with order histories (default: 5)')
+        parser.add_argument('--cart-lines', type=int, default=25,
+                            help='Distinct products in the benchmark cart (default: 25)')
+        parser.add_argument('--orders-per-user', type=int, default=100,
+                            help='Orders in each shopper history (default: 100)')
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Requests per scenario (default: 50)')
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+                            help='Scenario to run; repeat for several (default: all)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 slowdown against --baseline, as a fraction (default: 0.2)')
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['categories'] < 1 or options['users'] < 1:
+            raise CommandError('--products, --categories and --users must be at least 1.')
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2.')
+
+        # Never touch the real database: build and drop a test database
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            # Carts are seeded straight into the session
+            with override_settings(STORE_CART_STORAGE='store.cart_storage.SessionCartStorage'):
+                report = self.run(options)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+            self.stdout.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            if self.dataset_shape(baseline) != self.dataset_shape(report):
+                self.stderr.write(self.style.WARNING('The baseline was run on a different dataset.'))
+            regressions = compare_reports(baseline, report, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
+
+    def dataset_shape(self, report):
+        return {key: value for key, value in report.get('dataset', {}).items() if key != 'seed_seconds'}
+
+    def run(self, options):
+        self.stderr.write(f"Seeding {options['products']} products...")
+        started = time.perf_counter()
+        dataset = seed_catalog(
+            products=options['products'],
+            categories=options['categories'],
+            users=options['users'],
+            cart_lines=options['cart_lines'],
+            orders_per_user=options['orders_per_user'],
+        )
+        seed_seconds = time.perf_counter() - started
+
+        scenarios = options['scenarios'] or SCENARIOS
+        results = {}
+        for name in scenarios:
+            self.stderr.write(f'Running {name}...')
+            result = results[name] = run_scenario(name, dataset, options['iterations'])
+            self.stderr.write(
+                f"  p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  "
+                f"{result['queries']} queries  {result['peak_memory_kib']} KiB peak"
+            )
+
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                'products': options['products'],
+                'categories': options['categories'],
+                'users': options['users'],
+                'cart_lines': options['cart_lines'],
+                'orders_per_user': options['orders_per_user'],
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'iterations': options['iterations'],
+            'scenarios': results,
+        }
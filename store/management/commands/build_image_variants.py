@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from store.images import refresh_variants
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Build resized AVIF/WebP/JPEG variants (or minified SVGs) for product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild variants that are already up to date')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of products loaded per query (default: 100)')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image=None).order_by('id')
+
+        built = checked = 0
+        last_id = 0
+        while True:
+            batch = list(products.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for product in batch:
+                if refresh_variants(product, force=options['force']):
+                    built += 1
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'  {product.image.name}')
+            checked += len(batch)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'Built variants for {built} of {checked} product images.'))
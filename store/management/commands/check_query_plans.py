@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.query_plans import check_plans
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the storefront hot queries and fail if any of them scans a whole table'
+
+    def handle(self, *args, **options):
+        failures = []
+        try:
+            for name, plan, scanned in check_plans():
+                if scanned:
+                    failures.append(f"{name}: full scan of {', '.join(scanned)}")
+                    self.stdout.write(self.style.ERROR(f'FAIL  {name}'))
+                else:
+                    self.stdout.write(f'ok    {name}')
+                if scanned or options['verbosity'] > 1:
+                    for line in plan.splitlines():
+                        self.stdout.write(f'        {line}')
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        if failures:
+            raise CommandError('Queries without a usable index:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Every hot query uses an index.'))
@@ -0,0 +1,86 @@
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalog_io import FORMATS, build_image_variants, feed_format, import_catalog, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upsert categories and products from a CSV or JSON-lines feed, streaming it in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed to import, or - for standard input')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Feed format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rows upserted per transaction (default: 1000)')
+        parser.add_argument('--image-workers', type=int, default=0,
+                            help='Build image variants in this many processes while the import '
+                                 'continues (default: 0, build them between chunks)')
+        parser.add_argument('--skip-images', action='store_true',
+                            help='Leave image variants to the build_image_variants command')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = feed_format(path, options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        pool = None
+        if options['image_workers'] > 0 and not options['skip_images']:
+            # Spawned, not forked, so no worker shares this process's database connection
+            pool = ProcessPoolExecutor(
+                options['image_workers'], mp_context=get_context('spawn'), initializer=django.setup,
+            )
+        futures = []
+        built = 0
+        started = time.perf_counter()
+
+        def on_chunk(totals, stale_ids):
+            nonlocal built
+            if stale_ids and not options['skip_images']:
+                if pool:
+                    futures.append(pool.submit(build_image_variants, stale_ids))
+                else:
+                    built += build_image_variants(stale_ids)
+            if options['verbosity'] > 1:
+                rate = totals['rows'] / max(time.perf_counter() - started, 1e-9)
+                self.stderr.write(f"  {totals['rows']} rows, {rate:.0f} rows/s")
+
+        try:
+            if path == '-':
+                totals = import_catalog(read_rows(sys.stdin, fmt), options['batch_size'], on_chunk)
+            else:
+                try:
+                    feed = open(path, encoding='utf-8', newline='')
+                except OSError as e:
+                    raise CommandError(f'Cannot read {path}: {e}')
+                with feed:
+                    totals = import_catalog(read_rows(feed, fmt), options['batch_size'], on_chunk)
+            imported = time.perf_counter() - started
+            built += sum(future.result() for future in futures)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+        elapsed = time.perf_counter() - started
+
+        for number, message in totals['errors']:
+            self.stderr.write(self.style.WARNING(f'Line {number}: {message}'))
+        if totals['skipped'] > len(totals['errors']):
+            self.stderr.write(self.style.WARNING(
+                f"... and {totals['skipped'] - len(totals['errors'])} more invalid rows"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['rows']} rows ({totals['created']} created, {totals['updated']} updated, "
+            f"{totals['skipped']} skipped) in {imported:.2f}s, "
+            f"{totals['rows'] / max(imported, 1e-9):.0f} rows/s."
+        ))
+        if not options['skip_images']:
+            self.stdout.write(f'Built variants for {built} product images; done in {elapsed:.2f}s.')
@@ -0,0 +1,71 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.instrumentation import percentile
+
+
+class Command(BaseCommand):
+    help = 'Hammer a running server with concurrent GET requests and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Absolute URLs to request in round-robin order')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Number of simultaneous clients (default: 50)')
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Seconds to keep sending requests (default: 10)')
+        parser.add_argument('--timeout', type=float, default=30.0,
+                            help='Per-request timeout in seconds (default: 30)')
+
+    def handle(self, *args, **options):
+        urls = options['urls']
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1.')
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def client(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                url = urls[i % len(urls)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(url, timeout=options['timeout']) as response:
+                        response.read()
+                except (urllib.error.URLError, OSError) as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        if not latencies:
+            raise CommandError(f'Every request failed, e.g. {errors[0] if errors else "no requests sent"}')
+
+        # Nearest rank, so a run with a single successful request still reports
+        latencies.sort()
+        self.stdout.write(f'Clients:      {concurrency}')
+        self.stdout.write(f'Requests:     {len(latencies)} ok, {len(errors)} failed')
+        self.stdout.write(f'Throughput:   {len(latencies) / wall:.1f} req/s')
+        self.stdout.write(
+            f'Latency (ms): p50 {percentile(latencies, 50) * 1000:.1f}  '
+            f'p95 {percentile(latencies, 95) * 1000:.1f}  '
+            f'p99 {percentile(latencies, 99) * 1000:.1f}  max {latencies[-1] * 1000:.1f}'
+        )
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.urls import reverse
+
+from store.benchmark import seed_catalog
+from store.warmup import warm_up
+
+MODES = ['cold', 'warm']
+
+
+def first_requests(dataset):
+    """Time the first and second request to each page type of this process"""
+    category = dataset.categories[0]
+    product_slug = dataset.products[0][1]
+    pages = {
+        'home': reverse('store:home'),
+        'category_products': reverse('store:category_products', args=[category.slug]),
+        'product_detail': reverse('store:product_detail', args=[product_slug]),
+        'about': reverse('store:about'),
+        'login': reverse('store:login'),
+    }
+    client = Client()
+    timings = {}
+    for page, url in pages.items():
+        runs = []
+        for _ in range(2):
+            started = time.perf_counter()
+            response = client.get(url)
+            runs.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+        timings[page] = {'first_ms': round(runs[0], 2), 'second_ms': round(runs[1], 2)}
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        'Start fresh processes with and without store.warmup and compare the '
+        'latency of their first requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Fresh processes to start per mode (default: 3)')
+        parser.add_argument('--products', type=int, default=200,
+                            help='Products to seed in each throwaway database (default: 200)')
+        parser.add_argument('--output', help='Also write the report as JSON to this file')
+        # Set on the processes this command starts
+        parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self.measure(options['child'], options['products'])
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1.')
+
+        samples = {mode: [] for mode in MODES}
+        for run in range(options['runs']):
+            for mode in MODES:
+                self.stderr.write(f"Starting {mode} process {run + 1}/{options['runs']}...")
+                samples[mode].append(self.spawn(mode, options['products']))
+
+        report = self.build_report(samples)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def spawn(self, mode, products):
+        result = subprocess.run(
+            [sys.executable, '-m', 'django', 'measure_startup', '--child', mode, '--products', str(products)],
+            cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'The {mode} process failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def measure(self, mode, products):
+        # A throwaway test database, so the timings never depend on local data
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            dataset = seed_catalog(products=products, categories=5, users=1, cart_lines=0, orders_per_user=0)
+            warm_up_report = warm_up() if mode == 'warm' else None
+            result = {'warm_up': warm_up_report, 'pages': first_requests(dataset)}
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+        self.stdout.write(json.dumps(result))
+
+    def build_report(self, samples):
+        def median(values):
+            return round(statistics.median(values), 2)
+
+        pages = {}
+        for page in samples['cold'][0]['pages']:
+            pages[page] = {
+                f'{mode}_{key}': median([sample['pages'][page][key] for sample in samples[mode]])
+                for mode in MODES for key in ('first_ms', 'second_ms')
+            }
+        warm_up_steps = {
+            step: median([sample['warm_up'][step]['ms'] for sample in samples['warm']])
+            for step in samples['warm'][0]['warm_up']
+        }
+        return {'runs': len(samples['cold']), 'warm_up_ms': warm_up_steps, 'pages': pages}
+
+    def print_report(self, report):
+        steps = ', '.join(f'{step} {ms} ms' for step, ms in report['warm_up_ms'].items())
+        self.stdout.write(f"Medians of {report['runs']} runs per mode. Warm-up: {steps}")
+        self.stdout.write(f"{'page':<20} {'cold 1st ms':>12} {'warm 1st ms':>12} {'cold 2nd ms':>12} {'warm 2nd ms':>12}")
+        for page, timings in report['pages'].items():
+            self.stdout.write(
+                f"{page:<20} {timings['cold_first_ms']:>12} {timings['warm_first_ms']:>12} "
+                f"{timings['cold_second_ms']:>12} {timings['warm_second_ms']:>12}"
+            )
@@ -0,0 +1,232 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve
+
+from store.instrumentation import percentile
+
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+SAFE_METHODS = {'GET', 'HEAD'}
+
+
+def parse_timestamp(value):
+    """Seconds since the epoch from a number or an ISO 8601 string, or None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def load_entries(path):
+    """
+    Read replayable requests from a JSON-lines capture.
+
+    Each line needs a ``path`` (or a full ``url``); ``method``, ``headers``,
+    ``body`` and a ``ts``/``timestamp`` are optional. The request log lines
+    written by store.instrumentation have this shape. Other lines are
+    counted and skipped.
+    """
+    entries = []
+    skipped = 0
+    with open(path, encoding='utf-8') as capture:
+        for line in capture:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            target = (record.get('path') or record.get('url')) if isinstance(record, dict) else None
+            if not target:
+                skipped += 1
+                continue
+            split = urlsplit(target)
+            path = split.path + (f'?{split.query}' if split.query else '')
+            entries.append({
+                'method': str(record.get('method', 'GET')).upper(),
+                'path': path,
+                'headers': record.get('headers') or {},
+                'body': record.get('body'),
+                'ts': parse_timestamp(record.get('ts', record.get('timestamp'))),
+            })
+    return entries, skipped
+
+
+def route_name(path):
+    """The URL pattern name serving ``path``, so histograms group by view"""
+    try:
+        return resolve(urlsplit(path).path).view_name
+    except Resolver404:
+        return '<unresolved>'
+
+
+def send(base_url, method, path, headers, body, timeout):
+    """Issue one request; returns (status or None, seconds, error or None)"""
+    data = body.encode() if isinstance(body, str) else None
+    request = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError) as e:
+        return None, time.perf_counter() - started, type(e).__name__
+    return status, time.perf_counter() - started, None
+
+
+class Command(BaseCommand):
+    help = 'Replay a JSON-lines traffic capture against a running server and report per-route latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('capture', nargs='?', default='requests.jsonl',
+                            help='JSON-lines capture to replay (default: requests.jsonl)')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help='Server to send the requests to (default: http://127.0.0.1:8000)')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Size of the worker pool (default: 10)')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Run workers as threads or processes (default: thread)')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Time scale for captured timestamps: 2 replays twice as fast, '
+                                 '0 ignores them and sends as fast as the pool allows (default: 1)')
+        parser.add_argument('--limit', type=int, help='Replay at most this many requests')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Replay the capture this many times (default: 1)')
+        parser.add_argument('--include-unsafe', action='store_true',
+                            help='Also replay POST/PUT/DELETE requests (skipped by default)')
+        parser.add_argument('--timeout', type=float, default=30.0,
+                            help='Per-request timeout in seconds (default: 30)')
+        parser.add_argument('--output', help='Also write the report as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        if options['speed'] < 0:
+            raise CommandError('--speed cannot be negative.')
+        if not Path(options['capture']).exists():
+            raise CommandError(f"Capture file {options['capture']} does not exist.")
+
+        entries, skipped = load_entries(options['capture'])
+        if not options['include_unsafe']:
+            unsafe = sum(1 for entry in entries if entry['method'] not in SAFE_METHODS)
+            entries = [entry for entry in entries if entry['method'] in SAFE_METHODS]
+            skipped += unsafe
+        entries = entries * options['repeat']
+        if options['limit']:
+            entries = entries[:options['limit']]
+        if not entries:
+            raise CommandError(f'No replayable requests in {options["capture"]} ({skipped} lines skipped).')
+
+        schedule = self.schedule(entries, options['speed'])
+        base_url = options['base_url'].rstrip('/')
+        pool_class = ThreadPoolExecutor if options['pool'] == 'thread' else ProcessPoolExecutor
+
+        routes = {}
+        results = []
+        started = time.perf_counter()
+        with pool_class(max_workers=options['concurrency']) as pool:
+            for offset, entry in zip(schedule, entries):
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                route = routes.get(entry['path'])
+                if route is None:
+                    route = routes[entry['path']] = route_name(entry['path'])
+                future = pool.submit(
+                    send, base_url, entry['method'], entry['path'],
+                    entry['headers'], entry['body'], options['timeout'],
+                )
+                results.append((route, future))
+            outcomes = [(route, future.result()) for route, future in results]
+        wall = time.perf_counter() - started
+
+        report = self.build_report(outcomes, wall, skipped)
+        self.print_report(report)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def schedule(self, entries, speed):
+        """Send offsets in seconds, preserving captured gaps scaled by ``speed``"""
+        stamps = [entry['ts'] for entry in entries]
+        if speed == 0 or any(stamp is None for stamp in stamps):
+            return [0.0] * len(entries)
+        # Captures repeated with --repeat restart from the first timestamp,
+        # so offsets are accumulated from positive gaps only
+        offsets = [0.0]
+        for previous, current in zip(stamps, stamps[1:]):
+            offsets.append(offsets[-1] + max(0.0, current - previous) / speed)
+        return offsets
+
+    def build_report(self, outcomes, wall, skipped):
+        by_route = defaultdict(list)
+        for route, outcome in outcomes:
+            by_route[route].append(outcome)
+
+        routes = {}
+        for route, samples in sorted(by_route.items()):
+            latencies = sorted(seconds * 1000 for _, seconds, error in samples if error is None)
+            statuses = Counter(str(status) for status, _, error in samples if error is None)
+            errors = Counter(error for _, _, error in samples if error is not None)
+            errors.update({status: count for status, count in statuses.items() if int(status) >= 500})
+            histogram = Counter()
+            for latency in latencies:
+                bucket = next((f'<={bound}ms' for bound in BUCKETS_MS if latency <= bound), f'>{BUCKETS_MS[-1]}ms')
+                histogram[bucket] += 1
+            summary = {'requests': len(samples), 'statuses': dict(statuses), 'errors': dict(errors)}
+            if latencies:
+                summary.update({
+                    'p50_ms': round(percentile(latencies, 50), 2),
+                    'p95_ms': round(percentile(latencies, 95), 2),
+                    'p99_ms': round(percentile(latencies, 99), 2),
+                    'max_ms': round(latencies[-1], 2),
+                    'histogram': {
+                        bucket: histogram[bucket]
+                        for bucket in [f'<={bound}ms' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}ms']
+                        if histogram[bucket]
+                    },
+                })
+            routes[route] = summary
+
+        return {
+            'requests': len(outcomes),
+            'skipped_lines': skipped,
+            'wall_seconds': round(wall, 2),
+            'throughput_rps': round(len(outcomes) / wall, 1) if wall else None,
+            'routes': routes,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"Replayed {report['requests']} requests in {report['wall_seconds']} s "
+            f"({report['throughput_rps']} req/s), {report['skipped_lines']} lines skipped"
+        )
+        self.stdout.write(f"{'route':<32} {'reqs':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for route, summary in report['routes'].items():
+            errors = sum(summary['errors'].values())
+            self.stdout.write(
+                f"{route:<32} {summary['requests']:>6} {errors:>6} "
+                f"{summary.get('p50_ms', '-'):>9} {summary.get('p95_ms', '-'):>9} {summary.get('p99_ms', '-'):>9}"
+            )
+            if summary.get('histogram'):
+                buckets = '  '.join(f'{bucket}: {count}' for bucket, count in summary['histogram'].items())
+                self.stdout.write(f'    {buckets}')
@@ -0,0 +1,102 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from store.task_queue import DEFAULT_LEASE, claim, run_task
+
+
+def run_in_thread(claimed):
+    try:
+        return run_task(claimed)
+    finally:
+        # Pool threads come and go; never leave their connections open
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (store.task_queue) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Tasks run at once (default: 4)')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Run tasks in threads, or in processes for CPU-bound work (default: thread)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between polls of an empty queue (default: 1)')
+        parser.add_argument('--lease', type=int, default=DEFAULT_LEASE,
+                            help='Seconds before a claimed task counts as abandoned and runs again '
+                                 f'(default: {DEFAULT_LEASE})')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue has no due tasks left')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        if options['pool'] == 'process':
+            # Spawned, not forked, so no worker shares this process's database connection
+            pool = ProcessPoolExecutor(concurrency, mp_context=get_context('spawn'), initializer=django.setup)
+            runner = run_task
+        else:
+            pool = ThreadPoolExecutor(concurrency, thread_name_prefix='store-task')
+            runner = run_in_thread
+
+        self.stopping = False
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        if options['verbosity'] > 1:
+            self.stderr.write(f"Worker started: {concurrency} {options['pool']}s")
+
+        succeeded = failed = 0
+        running = set()
+        try:
+            while not self.stopping:
+                free = concurrency - len(running)
+                for claimed in claim(free, options['lease']) if free else []:
+                    running.add(pool.submit(runner, claimed))
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    outcome = self.outcome(future)
+                    if outcome:
+                        succeeded += 1
+                    elif outcome is False:
+                        failed += 1
+            # Let claimed tasks finish rather than wait out their lease
+            for future in running:
+                outcome = self.outcome(future)
+                if outcome:
+                    succeeded += 1
+                elif outcome is False:
+                    failed += 1
+        finally:
+            pool.shutdown(wait=True)
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {succeeded + failed} tasks: {succeeded} succeeded, {failed} failed.'
+        ))
+
+    def stop(self, signum, frame):
+        self.stderr.write('Stopping after the running tasks finish...')
+        self.stopping = True
+
+    def outcome(self, future):
+        # run_task's result: None for a run that lost its lease to another worker
+        try:
+            return future.result()
+        except Exception as e:
+            # The pool itself failed, e.g. a worker process died
+            self.stderr.write(self.style.ERROR(f'Task runner failed: {e}'))
+            return False
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # The partial product indexes are created before the full ones they
+    # replace are dropped, so the grids are never left without an index
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at'], name='order_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at'], name='order_status_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['paid', '-created_at'], name='order_paid_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True)), fields=['-created_at', '-id'], name='product_live_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True)), fields=['category', '-created_at', '-id'], name='product_live_cat_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wishlist',
+            index=models.Index(fields=['user', '-created_at'], name='wishlist_user_recent_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_avail_recent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_cat_recent_idx',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_order_and_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='store.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bought_with', to='store.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-orders'], name='copurchase_top_idx')],
+                'unique_together': {('product', 'related')},
+            },
+        ),
+    ]
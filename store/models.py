@@ -1,5 +1,11 @@
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -24,13 +30,28 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized/re-encoded copies of ``image``, maintained by store.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     stock = models.PositiveIntegerField(default=0)
     available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination seeks on (created_at, id) for the home and
+            # category grids, which only ever list available products
+            models.Index(
+                fields=['-created_at', '-id'], condition=Q(available=True), name='product_live_recent_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], condition=Q(available=True),
+                name='product_live_cat_recent_idx',
+            ),
+            # Admin prefix search (store.admin_tools)
+            models.Index(Lower('name'), name='product_name_lower_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -61,15 +82,54 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     paid = models.BooleanField(default=False)
+    # Totals are denormalized when the order is placed so listings never
+    # have to aggregate the order items
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    shipping_cost = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    item_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+            # Admin changelist: default ordering, date drill-down and filters
+            models.Index(fields=['-created_at'], name='order_recent_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_recent_idx'),
+            models.Index(fields=['paid', '-created_at'], name='order_paid_recent_idx'),
+            # Admin prefix search (store.admin_tools)
+            models.Index(Lower('email'), name='order_email_lower_idx'),
+            models.Index(Lower('last_name'), name='order_last_name_lower_idx'),
+        ]
 
     def __str__(self):
         return f'Order {self.id}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        # Remembered so the sales rollups can tell a status change (store.signals)
+        order._loaded_status = order.__dict__.get('status')
+        return order
+
     def get_total_cost(self):
-        return sum(item.get_cost() for item in self.items.all())
+        """Cost of the items, before shipping; ``total`` includes it"""
+        return self.subtotal
+
+    def update_totals(self, save=True):
+        """Recompute the stored totals from the order items"""
+        from .cart import shipping_cost_for
+        totals = self.items.aggregate(
+            subtotal=Sum(F('price') * F('quantity')),
+            item_count=Sum('quantity'),
+        )
+        self.subtotal = totals['subtotal'] or Decimal('0.00')
+        self.item_count = totals['item_count'] or 0
+        self.shipping_cost = shipping_cost_for(self.subtotal) if self.item_count else Decimal('0.00')
+        self.total = self.subtotal + self.shipping_cost
+        if save:
+            self.save(update_fields=['subtotal', 'shipping_cost', 'total', 'item_count', 'updated_at'])
 
 
 class OrderItem(models.Model):
@@ -85,6 +145,28 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+class CoPurchase(models.Model):
+    """
+    How many orders contained both ``product`` and ``related``.
+
+    Only pairs that were actually bought together get a row, one for each
+    direction, so a product's top recommendations are a single index range
+    read. Maintained by store.recommendations.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_purchases')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='bought_with')
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'related']
+        indexes = [
+            models.Index(fields=['product', '-orders'], name='copurchase_top_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} + {self.related_id} ({self.orders})'
+
+
 class Wishlist(models.Model):
     """User wishlist for saving favorite products"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wishlist_items')
@@ -94,6 +176,107 @@ class Wishlist(models.Model):
     class Meta:
         unique_together = ['user', 'product']  # Prevent duplicate wishlist items
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='wishlist_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.product.name}'
+
+
+# Sales rollups, maintained by store.rollups so reports never aggregate
+# OrderItem. Revenue is the goods subtotal; cancelled orders only count
+# towards OrderStatusSales. Counters are signed so an untracked edit can
+# never make an update fail; backfill_sales_rollups corrects any drift.
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    shipping = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name_plural = 'Daily sales'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f'{self.date}: {self.revenue}'
+
+
+class ProductSales(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name_plural = 'Product sales'
+        indexes = [
+            models.Index(fields=['-revenue'], name='productsales_top_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.units} units'
+
+
+class CategorySales(models.Model):
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name_plural = 'Category sales'
+
+    def __str__(self):
+        return f'{self.category_id}: {self.revenue}'
+
+
+class OrderStatusSales(models.Model):
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name_plural = 'Order status sales'
+
+    def __str__(self):
+        return f'{self.status}: {self.orders}'
+
+
+class Task(models.Model):
+    """
+    A queued call of a function registered with store.task_queue.task.
+
+    Workers (the run_worker command) claim due tasks by setting them
+    running, with ``run_at`` moved to when their claim expires, and delete
+    them once they succeed. A task that keeps failing stays as ``failed``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # When a queued task is due, or when a running task's claim expires
+    run_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
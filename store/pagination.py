@@ -0,0 +1,104 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+
+PRODUCTS_PER_PAGE = getattr(settings, 'STORE_PRODUCTS_PER_PAGE', 24)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def _signature(position):
+    return salted_hmac('store.pagination.cursor', position).hexdigest()[:16]
+
+
+def encode_cursor(product):
+    """Encode the (created_at, id) position of a product or values() row as an opaque token"""
+    if isinstance(product, dict):
+        created_at, product_id = product['created_at'], product['id']
+    else:
+        created_at, product_id = product.created_at, product.id
+    position = f'{created_at.isoformat()}|{product_id}'
+    raw = f'{position}|{_signature(position)}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor token back into a (created_at, id) pair.
+
+    Only tokens as encode_cursor wrote them are accepted, so pages (and
+    the cache keys built from cursors) exist only for real positions.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, product_id, signature = base64.urlsafe_b64decode(padded).decode().split('|')
+        position = f'{created_at}|{product_id}'
+        if not constant_time_compare(signature, _signature(position)):
+            raise ValueError('Bad signature')
+        decoded = datetime.fromisoformat(created_at), int(product_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(cursor) from e
+    if encode_cursor({'created_at': decoded[0], 'id': decoded[1]}) != cursor:
+        raise InvalidCursor(cursor)
+    return decoded
+
+
+class KeysetPage:
+    """One page of products plus the cursor pointing at the next page"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _seek(queryset, cursor):
+    """Order ``queryset`` for keyset pagination and skip past ``cursor``"""
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, product_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=product_id)
+        )
+    return queryset
+
+
+def _make_page(items, per_page):
+    # One extra row was fetched to learn whether another page exists
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1])
+    return KeysetPage(items, next_cursor)
+
+
+def paginate_products(queryset, cursor=None, per_page=PRODUCTS_PER_PAGE):
+    """
+    Return a KeysetPage of ``queryset`` ordered by (-created_at, -id).
+
+    Seeks past ``cursor`` with an indexed range condition instead of OFFSET,
+    so deep pages cost the same as the first one.
+    """
+    queryset = _seek(queryset, cursor)
+    return _make_page(list(queryset[:per_page + 1]), per_page)
+
+
+async def apaginate_products(queryset, cursor=None, per_page=PRODUCTS_PER_PAGE):
+    """Async version of paginate_products"""
+    queryset = _seek(queryset, cursor)
+    return _make_page([item async for item in queryset[:per_page + 1]], per_page)
@@ -0,0 +1,83 @@
+"""
+Query plans of the storefront's hot queries.
+
+HOT_QUERIES lists the queries behind the catalog grids, product pages and
+their recommendations, carts, order history, wishlists and the order and
+product admin, written the way the views write them. ``check_plans`` runs
+EXPLAIN on each and reports the ones that read a whole table instead of
+using an index. The ``check_query_plans`` management command fails when
+there are any.
+"""
+import re
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from django.db import connection, transaction
+
+from .admin_tools import prefix_filter
+from .models import Order, OrderItem, Product, Wishlist
+from .recommendations import _recommended
+from .pagination import PRODUCTS_PER_PAGE, _seek, encode_cursor
+
+
+# Placeholder values; the plan does not depend on whether rows match
+_SOME_ID = 1
+_SOME_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_SOME_CURSOR = encode_cursor(SimpleNamespace(created_at=_SOME_TIME, id=_SOME_ID))
+
+HOT_QUERIES = [
+    ('home grid', lambda: _seek(Product.objects.filter(available=True), None)[:PRODUCTS_PER_PAGE + 1]),
+    ('home grid, next page', lambda: _seek(
+        Product.objects.filter(available=True), _SOME_CURSOR,
+    )[:PRODUCTS_PER_PAGE + 1]),
+    ('category grid', lambda: _seek(
+        Product.objects.filter(available=True, category_id=_SOME_ID), None,
+    )[:PRODUCTS_PER_PAGE + 1]),
+    ('product detail', lambda: Product.objects.filter(slug='some-product', available=True)),
+    ('recommendations', lambda: _recommended(SimpleNamespace(id=_SOME_ID))[:4]),
+    ('cart hydration', lambda: Product.objects.filter(id__in=[1, 2, 3])),
+    ('order history', lambda: Order.objects.filter(user_id=_SOME_ID).order_by('-created_at')[:10]),
+    ('order history items', lambda: OrderItem.objects.filter(order_id__in=[1, 2, 3])),
+    ('wishlist page', lambda: Wishlist.objects.filter(user_id=_SOME_ID).order_by('-created_at')),
+    ('wishlist ids', lambda: Wishlist.objects.filter(user_id=_SOME_ID).values_list('product_id', flat=True)),
+    ('admin orders', lambda: Order.objects.order_by('-created_at')[:100]),
+    ('admin orders by status', lambda: Order.objects.filter(status='pending').order_by('-created_at')[:100]),
+    ('admin orders by paid', lambda: Order.objects.filter(paid=False).order_by('-created_at')[:100]),
+    ('admin orders by date', lambda: Order.objects.filter(created_at__gte=_SOME_TIME).order_by('-created_at')[:100]),
+    ('admin order search', lambda: prefix_filter(Order.objects.all(), ('email', 'last_name'), 'smi')[:100]),
+    ('admin product search', lambda: prefix_filter(Product.objects.all(), ('name',), 'lam')[:100]),
+]
+
+
+# A plan line reading a whole table, per backend
+_FULL_SCAN = {
+    # "SCAN [TABLE] store_product" but not "SCAN store_product USING [COVERING] INDEX ..."
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def explain(queryset):
+    """The backend's query plan for ``queryset`` as text"""
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Tiny development tables make sequential scans look cheapest;
+            # this only leaves them in the plan when no index applies
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+    return queryset.explain()
+
+
+def full_scans(plan, vendor=None):
+    """Names of the tables ``plan`` reads in full"""
+    pattern = _FULL_SCAN.get(vendor or connection.vendor)
+    if pattern is None:
+        raise NotImplementedError(f'No full-scan detection for {vendor or connection.vendor}')
+    return sorted({match.group(1) for match in pattern.finditer(plan)})
+
+
+def check_plans(queries=HOT_QUERIES):
+    """Yield (name, plan, tables scanned in full) for each hot query"""
+    for name, build in queries:
+        plan = explain(build())
+        yield name, plan, full_scans(plan)
@@ -0,0 +1,99 @@
+"""
+"Frequently bought together" recommendations.
+
+The CoPurchase table is a sparse product co-occurrence matrix: one row per
+ordered pair of products that have appeared in the same order, counting
+those orders. ``record_order`` adds a freshly placed order to it and
+``rebuild`` recomputes it from every OrderItem. A product page reads its
+top pairs in one indexed query and only falls back to products from the
+same category while the product has too little purchase history.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import CoPurchase, OrderItem, Product
+
+RECOMMENDATION_LIMIT = getattr(settings, 'STORE_RECOMMENDATION_LIMIT', 4)
+
+
+def record_order(product_ids):
+    """Count one more order for every pair among ``product_ids``"""
+    product_ids = sorted(set(product_ids))
+    if len(product_ids) < 2:
+        return
+    with transaction.atomic():
+        # Create the missing pairs at zero, then count the order for all of
+        # them; concurrent orders can never lose an increment this way
+        CoPurchase.objects.bulk_create(
+            [
+                CoPurchase(product_id=product_id, related_id=related_id)
+                for product_id in product_ids
+                for related_id in product_ids
+                if product_id != related_id
+            ],
+            ignore_conflicts=True,
+        )
+        CoPurchase.objects.filter(
+            product_id__in=product_ids, related_id__in=product_ids,
+        ).update(orders=F('orders') + 1)
+
+
+def rebuild(batch_size=2000):
+    """Recompute the whole co-occurrence table from the order items; returns the pair count"""
+    pairs = (
+        OrderItem.objects
+        .annotate(related_id=F('order__items__product_id'))
+        .exclude(product_id=F('related_id'))
+        .values('product_id', 'related_id')
+        .annotate(orders=Count('order_id', distinct=True))
+        .order_by()
+    )
+    created = 0
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        batch = []
+        for pair in pairs.iterator(chunk_size=batch_size):
+            batch.append(CoPurchase(**pair))
+            if len(batch) == batch_size:
+                CoPurchase.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        CoPurchase.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def _recommended(product):
+    return (
+        Product.objects.filter(available=True, bought_with__product_id=product.id)
+        .select_related('category')
+        .order_by('-bought_with__orders', 'id')
+    )
+
+
+def _same_category(product, exclude_ids):
+    return (
+        Product.objects.filter(category_id=product.category_id, available=True)
+        .exclude(id__in=[product.id, *exclude_ids])
+        .select_related('category')
+    )
+
+
+def related_products(product, limit=RECOMMENDATION_LIMIT):
+    """Products most often bought with ``product``, topped up from its category"""
+    related = list(_recommended(product)[:limit])
+    if len(related) < limit:
+        related += _same_category(product, [item.id for item in related])[:limit - len(related)]
+    return related
+
+
+async def arelated_products(product, limit=RECOMMENDATION_LIMIT):
+    """Async version of related_products"""
+    related = [item async for item in _recommended(product)[:limit]]
+    if len(related) < limit:
+        related += [
+            item async for item in
+            _same_category(product, [item.id for item in related])[:limit - len(related)]
+        ]
+    return related
@@ -0,0 +1,197 @@
+"""
+Incrementally maintained sales rollups.
+
+DailySales, ProductSales, CategorySales and OrderStatusSales hold running
+totals so reports read a few dozen rows however many order items exist.
+``record_order`` adds a newly placed order (queued as an
+``order_snapshot`` by checkout and the admin), ``change_status`` moves an
+order between statuses (taking it out of, or back into, the revenue
+rollups when it is cancelled or reinstated) and ``remove_order`` takes a
+deleted order out. Each rollup touched costs a single upsert, run in the
+caller's transaction.
+``backfill`` recomputes everything from the orders.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CategorySales, DailySales, Order, OrderItem, OrderStatusSales, ProductSales
+
+CANCELLED = 'cancelled'
+
+
+def _add(model, key, deltas):
+    """
+    Add ``deltas``, ``{key value: {field: amount}}``, to the rows of
+    ``model``, creating the missing ones. Concurrent writers never lose an
+    increment: the addition happens in the database, in one upsert where
+    the backend has one.
+    """
+    if not deltas:
+        return
+    fields = sorted({field for amounts in deltas.values() for field in amounts})
+    if connection.vendor in ('sqlite', 'postgresql'):
+        _upsert(model, key, fields, deltas)
+        return
+    model.objects.bulk_create([model(**{key: value}) for value in deltas], ignore_conflicts=True)
+    model.objects.filter(**{f'{key}__in': list(deltas)}).update(**{
+        field: F(field) + Case(
+            *(When(**{key: value}, then=Value(amounts.get(field, 0))) for value, amounts in deltas.items()),
+            default=Value(0),
+            output_field=model._meta.get_field(field),
+        )
+        for field in fields
+    })
+
+
+def _upsert(model, key, fields, deltas):
+    # INSERT ... ON CONFLICT (key) DO UPDATE SET field = field + excluded.field
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key_field = model._meta.get_field(key)
+    value_fields = [model._meta.get_field(field) for field in fields]
+    columns = [qn(field.column) for field in [key_field, *value_fields]]
+    rows = []
+    params = []
+    for value, amounts in deltas.items():
+        rows.append(f"({', '.join(['%s'] * len(columns))})")
+        params.append(key_field.get_db_prep_value(value, connection))
+        params += [field.get_db_prep_value(amounts.get(field.name, 0), connection) for field in value_fields]
+    updates = ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in columns[1:])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join(rows)} "
+            f"ON CONFLICT ({columns[0]}) DO UPDATE SET {updates}",
+            params,
+        )
+
+
+def order_lines(order):
+    """(product id, category id, quantity, price) of each item of a saved order"""
+    return list(order.items.values_list('product_id', 'product__category_id', 'quantity', 'price'))
+
+
+def _apply(order, lines, sign):
+    # Add (sign=1) or subtract (sign=-1) the order's revenue contributions
+    products = {}
+    categories = {}
+    units = 0
+    for product_id, category_id, quantity, price in lines:
+        for deltas, key in ((products, product_id), (categories, category_id)):
+            amounts = deltas.setdefault(key, {'units': 0, 'revenue': Decimal('0.00')})
+            amounts['units'] += sign * quantity
+            amounts['revenue'] += sign * price * quantity
+        units += quantity
+
+    _add(DailySales, 'date', {
+        timezone.localdate(order.created_at): {
+            'orders': sign,
+            'units': sign * units,
+            'revenue': sign * order.subtotal,
+            'shipping': sign * order.shipping_cost,
+        },
+    })
+    _add(ProductSales, 'product_id', products)
+    _add(CategorySales, 'category_id', categories)
+
+
+def record_order(order, lines):
+    """Add a newly placed ``order`` with ``lines`` as returned by order_lines"""
+    _add(OrderStatusSales, 'status', {order.status: {'orders': 1, 'revenue': order.subtotal}})
+    if order.status != CANCELLED:
+        _apply(order, lines, 1)
+
+
+def order_snapshot(order, lines):
+    """
+    What record_order needs of a newly placed ``order``, as JSON-ready data.
+
+    Queued instead of the order id so the rollups count the order as it was
+    placed: a status change or deletion that runs first is already tracked
+    against that status, and the two updates add up the same either way.
+    """
+    return {
+        'created_at': order.created_at.isoformat(),
+        'status': order.status,
+        'subtotal': str(order.subtotal),
+        'shipping_cost': str(order.shipping_cost),
+        'lines': [
+            [product_id, category_id, quantity, str(price)]
+            for product_id, category_id, quantity, price in lines
+        ],
+    }
+
+
+def record_snapshot(snapshot):
+    """record_order from an order_snapshot"""
+    order = Order(
+        created_at=parse_datetime(snapshot['created_at']),
+        status=snapshot['status'],
+        subtotal=Decimal(snapshot['subtotal']),
+        shipping_cost=Decimal(snapshot['shipping_cost']),
+    )
+    lines = [
+        (product_id, category_id, quantity, Decimal(price))
+        for product_id, category_id, quantity, price in snapshot['lines']
+    ]
+    record_order(order, lines)
+
+
+def change_status(order, old_status, new_status):
+    """Move a saved ``order`` from ``old_status`` to ``new_status``"""
+    _add(OrderStatusSales, 'status', {
+        old_status: {'orders': -1, 'revenue': -order.subtotal},
+        new_status: {'orders': 1, 'revenue': order.subtotal},
+    })
+    if (old_status == CANCELLED) != (new_status == CANCELLED):
+        _apply(order, order_lines(order), -1 if new_status == CANCELLED else 1)
+
+
+def remove_order(order):
+    """Take an ``order`` that is about to be deleted out of the rollups"""
+    status = getattr(order, '_loaded_status', None) or order.status
+    _add(OrderStatusSales, 'status', {status: {'orders': -1, 'revenue': -order.subtotal}})
+    if status != CANCELLED:
+        _apply(order, order_lines(order), -1)
+
+
+def backfill(batch_size=1000):
+    """Recompute every rollup from the orders; returns the number of rows written per rollup"""
+    live_items = OrderItem.objects.exclude(order__status=CANCELLED).order_by()
+    sources = [
+        (DailySales, (
+            Order.objects.exclude(status=CANCELLED)
+            .annotate(date=TruncDate('created_at'))
+            .values('date')
+            .annotate(
+                orders=Count('id'), units=Sum('item_count'),
+                revenue=Sum('subtotal'), shipping=Sum('shipping_cost'),
+            )
+            .order_by()
+        )),
+        (ProductSales, (
+            live_items.values('product_id')
+            .annotate(units=Sum('quantity'), revenue=Sum(F('price') * F('quantity')))
+        )),
+        (CategorySales, (
+            live_items.values(category_id=F('product__category_id'))
+            .annotate(units=Sum('quantity'), revenue=Sum(F('price') * F('quantity')))
+        )),
+        (OrderStatusSales, (
+            Order.objects.values('status').annotate(orders=Count('id'), revenue=Sum('subtotal')).order_by()
+        )),
+    ]
+
+    written = {}
+    with transaction.atomic():
+        for model, rows in sources:
+            model.objects.all().delete()
+            created = model.objects.bulk_create(
+                (model(**row) for row in rows.iterator(chunk_size=batch_size)), batch_size=batch_size,
+            )
+            written[model._meta.model_name] = len(created)
+    return written
@@ -0,0 +1,214 @@
+"""
+Storefront product search.
+
+On SQLite, products are indexed in an FTS5 virtual table (created by
+migration 0005) that signals keep in sync and ``rebuild_search_index``
+repopulates. Other database backends fall back to ``icontains`` filters
+until a native full-text backend is wired in.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Product
+
+
+FTS_TABLE = 'store_product_fts'
+
+# Control characters never appear in product text, so they can mark
+# highlight boundaries safely until the text has been escaped
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# Suggestions are ranked among this many matches. Ranking every match of a
+# short prefix scores the whole index before LIMIT applies
+AUTOCOMPLETE_CANDIDATES = 200
+
+
+@dataclass(slots=True)
+class SearchHit:
+    product: Product
+    name_html: str
+    snippet_html: str
+
+
+@dataclass
+class SearchResults:
+    hits: list = field(default_factory=list)
+    total: int = 0
+    # (category_id, count) pairs, most populated first
+    facets: list = field(default_factory=list)
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _highlight(text):
+    """Escape ``text`` and turn the highlight markers into <mark> tags"""
+    html = escape(text or '')
+    return mark_safe(html.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def build_match_query(text, column=None):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so user input cannot inject FTS syntax, and the
+    last word is a prefix match so partially typed queries still hit.
+    """
+    terms = _TERM_RE.findall(text.lower())
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    expression = ' '.join(quoted)
+    if column:
+        expression = f'{column} : ({expression})'
+    return expression
+
+
+def index_product(product):
+    """Add, refresh or drop one product's index row"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.id])
+        if product.available:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, category_id) VALUES (%s, %s, %s, %s)',
+                [product.id, product.name, product.description, product.category_id],
+            )
+
+
+def unindex_product(product_id):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_index(batch_size=2000):
+    """Repopulate the index from scratch, returning the number of rows indexed"""
+    if not fts_enabled():
+        return 0
+    rows = Product.objects.filter(available=True).order_by().values_list(
+        'id', 'name', 'description', 'category_id'
+    )
+    indexed = 0
+    # One transaction: in autocommit every inserted row would flush its own index segment
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, name, description, category_id) VALUES (%s, %s, %s, %s)',
+                    batch,
+                )
+                indexed += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, category_id) VALUES (%s, %s, %s, %s)',
+                batch,
+            )
+            indexed += len(batch)
+        # Merge the index b-trees so queries touch as few pages as possible
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def search_products(text, category_id=None, limit=24, offset=0):
+    """Ranked search over product names and descriptions"""
+    if fts_enabled():
+        return _fts_search(text, category_id, limit, offset)
+    return _basic_search(text, category_id, limit, offset)
+
+
+def autocomplete(text, limit=8):
+    """
+    Up to ``limit`` (name, slug) pairs whose name starts with the typed
+    words, the best ranked of the first AUTOCOMPLETE_CANDIDATES matches
+    """
+    if not fts_enabled():
+        return list(
+            Product.objects.filter(available=True, name__istartswith=text.strip())
+            .order_by('name').values_list('name', 'slug')[:limit]
+        )
+    match = build_match_query(text, column='name')
+    if match is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT p.name, p.slug FROM ('
+            f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s'
+            f') AS candidates JOIN store_product p ON p.id = candidates.rowid '
+            f'ORDER BY candidates.rank LIMIT %s',
+            [match, AUTOCOMPLETE_CANDIDATES, limit],
+        )
+        return cursor.fetchall()
+
+
+def _fts_search(text, category_id, limit, offset):
+    match = build_match_query(text)
+    if match is None:
+        return SearchResults()
+
+    where = f'{FTS_TABLE} MATCH %s'
+    params = [match]
+    if category_id:
+        where += ' AND category_id = %s'
+        params.append(category_id)
+
+    with connection.cursor() as cursor:
+        # Matches in the name weigh ten times more than in the description
+        cursor.execute(
+            f'SELECT rowid, highlight({FTS_TABLE}, 0, %s, %s), '
+            f"snippet({FTS_TABLE}, 1, %s, %s, '…', 16) "
+            f'FROM {FTS_TABLE} WHERE {where} '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s OFFSET %s',
+            [_MARK_START, _MARK_END, _MARK_START, _MARK_END, *params, limit, offset],
+        )
+        rows = cursor.fetchall()
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {where}', params)
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f'SELECT category_id, COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'GROUP BY category_id ORDER BY COUNT(*) DESC',
+            [match],
+        )
+        facets = [(int(category), count) for category, count in cursor.fetchall()]
+
+    products = Product.objects.select_related('category').in_bulk([row[0] for row in rows])
+    hits = [
+        SearchHit(products[product_id], _highlight(name), _highlight(snippet))
+        for product_id, name, snippet in rows
+        if product_id in products
+    ]
+    return SearchResults(hits=hits, total=total, facets=facets)
+
+
+def _basic_search(text, category_id, limit, offset):
+    terms = _TERM_RE.findall(text)
+    if not terms:
+        return SearchResults()
+    matches = Q()
+    for term in terms:
+        matches &= Q(name__icontains=term) | Q(description__icontains=term)
+    products = Product.objects.filter(matches, available=True)
+    facets = list(
+        products.order_by().values_list('category_id').annotate(count=Count('id')).order_by('-count')
+    )
+    if category_id:
+        products = products.filter(category_id=category_id)
+    page = products.select_related('category').order_by('name')[offset:offset + limit]
+    hits = [SearchHit(product, escape(product.name), '') for product in page]
+    return SearchResults(hits=hits, total=products.count(), facets=facets)
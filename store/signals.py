@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .catalog_cache import bump_catalog_version
+from .category_registry import category_registry
+from .images import variants_stale
+from .models import Category, Order, Product, Wishlist
+from .rollups import change_status, remove_order
+from .search import index_product, unindex_product
+from .tasks import build_product_image_variants
+from .wishlist import add_wishlist_id, discard_wishlist_id
+
+
+# Each handler invalidates immediately and again on commit, so a reader that
+# repopulated from pre-commit data in the meantime is not left serving it
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Drop cached catalog pages whenever a product or category changes"""
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def reload_category_registry(sender, **kwargs):
+    """Make every worker reload its category index"""
+    category_registry.invalidate()
+    transaction.on_commit(category_registry.invalidate)
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def build_image_variants(sender, instance, raw=False, **kwargs):
+    """Queue responsive sizes and formats when the image changes"""
+    if not raw and variants_stale(instance):
+        build_product_image_variants.enqueue(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_product(instance.id)
+
+
+# Patching is idempotent, so the on-commit pass only repairs a set that a
+# concurrent reader reloaded before this write was visible
+
+@receiver(post_save, sender=Wishlist)
+def add_to_wishlist_cache(sender, instance, created, **kwargs):
+    if created:
+        add_wishlist_id(instance.user_id, instance.product_id)
+        transaction.on_commit(lambda: add_wishlist_id(instance.user_id, instance.product_id))
+
+
+@receiver(post_delete, sender=Wishlist)
+def remove_from_wishlist_cache(sender, instance, **kwargs):
+    discard_wishlist_id(instance.user_id, instance.product_id)
+    transaction.on_commit(lambda: discard_wishlist_id(instance.user_id, instance.product_id))
+
+
+@receiver(post_save, sender=Order)
+def track_order_status(sender, instance, created, **kwargs):
+    """Move a saved order between statuses in the sales rollups"""
+    # New orders are added by whoever creates their items (place_order, the admin)
+    previous = getattr(instance, '_loaded_status', None)
+    if not created and previous is not None and previous != instance.status:
+        change_status(instance, previous, instance.status)
+    instance._loaded_status = instance.status
+
+
+@receiver(pre_delete, sender=Order)
+def untrack_order(sender, instance, **kwargs):
+    """Take a deleted order out of the sales rollups while its items still exist"""
+    remove_order(instance)
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from .catalog_cache import stats as catalog_cache_stats
+from .category_registry import category_registry
+from .instrumentation import query_budget, view_stats
+from .models import CategorySales, DailySales, OrderStatusSales, ProductSales
+
+DASHBOARD_DAYS = 30
+TOP_PRODUCTS = 10
+
+
+@staff_member_required
+def request_metrics(request):
+    """Rolling per-view latency percentiles and query counts of this worker"""
+    return JsonResponse({
+        'views': view_stats.snapshot(),
+        'catalog_cache': catalog_cache_stats.snapshot(),
+    })
+
+
+@query_budget(7)
+@staff_member_required
+def sales_dashboard(request):
+    """Sales report read from the rollup tables only (see store.rollups)"""
+    try:
+        days = min(max(int(request.GET.get('days', DASHBOARD_DAYS)), 1), 365)
+    except ValueError:
+        days = DASHBOARD_DAYS
+    since = timezone.localdate() - timedelta(days=days - 1)
+
+    daily = list(DailySales.objects.filter(date__gte=since).order_by('-date'))
+    category_sales = [
+        (category_registry.get_by_id(row.category_id), row)
+        for row in CategorySales.objects.order_by('-revenue')
+    ]
+    return render(request, 'store/staff/sales_dashboard.html', {
+        'days': days,
+        'daily': daily,
+        'totals': {
+            field: sum(getattr(row, field) for row in daily)
+            for field in ('orders', 'units', 'revenue', 'shipping')
+        },
+        'top_products': ProductSales.objects.select_related('product').order_by('-revenue')[:TOP_PRODUCTS],
+        'category_sales': category_sales,
+        'statuses': OrderStatusSales.objects.order_by('status'),
+    })
@@ -0,0 +1,146 @@
+"""
+A database-backed task queue for work that should not hold up a request.
+
+Functions decorated with ``@task()`` gain an ``enqueue(*args, **kwargs)``
+method. It writes a Task row once the current transaction commits, so a
+worker never sees work for data that was rolled back, and the request only
+pays for one INSERT. Arguments must be JSON-serializable (DjangoJSONEncoder
+handles dates and Decimals, which arrive as strings).
+
+Workers (``python manage.py run_worker``) claim due tasks in one
+conditional UPDATE, so two workers never run the same task. A claim lasts
+``lease`` seconds, after which a task whose worker died is claimed again.
+Each run is atomic and deletes its task in the same transaction; a run
+that outlived its lease finds the task claimed by another worker, so it
+rolls back and leaves the task to that worker. A failed run is retried
+after RETRY_DELAY seconds, doubling with each attempt up to
+MAX_RETRY_DELAY, until the task's ``max_attempts`` are used up and it is
+left ``failed`` for the admin.
+
+With STORE_TASKS_SYNC set, as the test runner sets it, ``enqueue`` runs
+the task right away in the caller's transaction instead, outside the
+request's query count.
+"""
+import json
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+
+from .instrumentation import detached
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = getattr(settings, 'STORE_TASK_RETRY_DELAY', 10)
+MAX_RETRY_DELAY = 60 * 60
+DEFAULT_LEASE = 300
+
+# Registered functions by name
+TASKS = {}
+
+
+class LeaseLost(Exception):
+    """A task's lease ran out while it ran and another worker claimed it"""
+
+
+def task(max_attempts=5):
+    """Register the decorated function as a task and give it ``enqueue``"""
+
+    def register(func):
+        name = f'{func.__module__}.{func.__name__}'
+        TASKS[name] = func
+        func.task_name = name
+        func.enqueue = lambda *args, **kwargs: enqueue(name, args, kwargs, max_attempts)
+        return func
+
+    return register
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=5):
+    """Queue a call of task ``name`` once the current transaction commits"""
+    # Round-tripped so tasks see the same types whether queued or not
+    args, kwargs = json.loads(json.dumps([list(args), kwargs or {}], cls=DjangoJSONEncoder))
+    if getattr(settings, 'STORE_TASKS_SYNC', False):
+        # A worker would run it, so it is not charged to the request
+        with detached():
+            TASKS[name](*args, **kwargs)
+        return
+    transaction.on_commit(
+        lambda: Task.objects.create(name=name, args=args, kwargs=kwargs, max_attempts=max_attempts),
+        robust=True,
+    )
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying a task that failed ``attempts`` times"""
+    delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    # Jitter, so tasks that failed together do not all retry together
+    return delay * random.uniform(0.9, 1.1)
+
+
+def claim(limit, lease=DEFAULT_LEASE):
+    """Claim up to ``limit`` due tasks for this caller; returns them"""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    # Expired claims are due again
+    due = Task.objects.filter(status__in=[Task.QUEUED, Task.RUNNING], run_at__lte=now)
+    claimed = due.filter(id__in=Subquery(due.order_by('run_at', 'id').values('id')[:limit])).update(
+        status=Task.RUNNING, claimed_by=token, attempts=F('attempts') + 1,
+        run_at=now + timedelta(seconds=lease),
+    )
+    if not claimed:
+        return []
+    return list(Task.objects.filter(claimed_by=token, status=Task.RUNNING))
+
+
+def run_task(claimed):
+    """
+    Run a claimed task and record the outcome; returns True if it succeeded,
+    False if it failed and None if it lost its lease (and was rolled back)
+    """
+    mine = Task.objects.filter(pk=claimed.pk, claimed_by=claimed.claimed_by)
+    try:
+        func = TASKS.get(claimed.name)
+        if func is None:
+            raise LookupError(f'No task is registered as {claimed.name}')
+        with transaction.atomic():
+            func(*claimed.args, **claimed.kwargs)
+            deleted, _ = mine.delete()
+            if not deleted:
+                raise LeaseLost
+    except LeaseLost:
+        logger.warning('Task %s (%s) outlived its lease; rolled back', claimed.pk, claimed.name)
+        return None
+    except Exception:
+        error = traceback.format_exc()
+        if claimed.attempts >= claimed.max_attempts:
+            logger.error('Task %s (%s) failed for good:\n%s', claimed.pk, claimed.name, error)
+            mine.update(status=Task.FAILED, last_error=error)
+        else:
+            logger.warning('Task %s (%s) failed, will retry:\n%s', claimed.pk, claimed.name, error)
+            mine.update(
+                status=Task.QUEUED, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=retry_delay(claimed.attempts)),
+            )
+        return False
+    return True
+
+
+def run_due(limit=100, lease=DEFAULT_LEASE):
+    """Claim and run due tasks in this thread; returns (succeeded, failed)"""
+    succeeded = failed = 0
+    for claimed in claim(limit, lease):
+        outcome = run_task(claimed)
+        if outcome:
+            succeeded += 1
+        elif outcome is False:
+            failed += 1
+    return succeeded, failed
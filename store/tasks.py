@@ -0,0 +1,30 @@
+"""Work queued by checkout, the admin and product saves (see store.task_queue)"""
+from django.db import transaction
+
+from . import recommendations, rollups
+from .catalog_cache import bump_products
+from .images import refresh_variants
+from .models import Product
+from .task_queue import task
+
+
+@task()
+def record_order_sales(snapshot):
+    """Add a placed order, as taken by rollups.order_snapshot, to the sales rollups"""
+    rollups.record_snapshot(snapshot)
+
+
+@task()
+def record_co_purchases(product_ids):
+    """Count an order's products as bought together"""
+    recommendations.record_order(product_ids)
+    # Their cached recommendations may rank differently now
+    transaction.on_commit(lambda: bump_products(product_ids))
+
+
+@task(max_attempts=3)
+def build_product_image_variants(product_id):
+    """Derive responsive sizes and formats of a product's current image"""
+    product = Product.objects.filter(pk=product_id).first()
+    if product is not None:
+        refresh_variants(product)
@@ -1,5 +1,10 @@
 from django import template
 from django.template.defaultfilters import stringfilter
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from .. import images
+from ..catalog_cache import CSRF_PLACEHOLDER, render_fragment
 
 register = template.Library()
 
@@ -15,4 +20,101 @@ def mul(value, arg):
     try:
         return float(value) * float(arg)
     except (ValueError, TypeError):
-        return 0
\ No newline at end of file
+        return 0
+
+
+class CatalogCacheNode(template.Node):
+    def __init__(self, nodelist, vary_on, showing):
+        self.nodelist = nodelist
+        self.vary_on = vary_on
+        self.showing = showing
+
+    def render(self, context):
+        parts = ['fragment'] + [var.resolve(context) for var in self.vary_on]
+        showing = [var.resolve(context) for var in self.showing]
+
+        def render():
+            # Render with a placeholder so no visitor's CSRF token is cached
+            with context.push(csrf_token=CSRF_PLACEHOLDER):
+                return self.nodelist.render(context)
+
+        return mark_safe(render_fragment(parts, render, context.get('csrf_token'), showing))
+
+
+@register.tag
+def catalogcache(parser, token):
+    """
+    Cache the enclosed catalog fragment until the catalog changes.
+
+    Usage::
+
+        {% catalogcache "home" selected_category request.GET.cursor showing products %}
+            ...
+        {% endcatalogcache %}
+
+    The arguments form the cache key. Those after ``showing`` are the
+    products (or lists of them) the block displays; it is rendered again
+    once any of them changes, e.g. when a checkout changes its stock.
+    Per-user output (the cart badge, the account menu) must stay outside
+    the block; CSRF tokens inside it are substituted on every render.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least one argument.")
+    showing = []
+    if 'showing' in bits:
+        at = bits.index('showing')
+        bits, showing = bits[:at], bits[at + 1:]
+    nodelist = parser.parse(('endcatalogcache',))
+    parser.delete_first_token()
+    return CatalogCacheNode(
+        nodelist,
+        [parser.compile_filter(bit) for bit in bits[1:]],
+        [parser.compile_filter(bit) for bit in showing],
+    )
+
+
+@register.simple_tag
+def product_image(product, sizes='100vw', width=None, **attrs):
+    """
+    Render ``product.image`` as a responsive ``<picture>``.
+
+    Usage::
+
+        {% product_image product sizes="(min-width: 1024px) 25vw, 50vw" width=320 class="w-full" %}
+
+    ``sizes`` tells the browser how wide the image is laid out and ``width``
+    picks the JPEG used as ``src`` by browsers without ``srcset``. Other
+    keyword arguments become attributes of the ``<img>``; ``alt`` defaults
+    to the product name. Images without built variants, or whose variants
+    are still those of a previous image while the rebuild is queued, fall
+    back to a plain ``<img>`` of the original.
+    """
+    if not product.image:
+        return ''
+    attrs.setdefault('alt', product.name)
+    attrs.setdefault('decoding', 'async')
+    img_attrs = format_html_join(' ', '{}="{}"', attrs.items())
+    variants = product.image_variants or {}
+
+    if images.variants_stale(product):
+        return format_html('<img src="{}" {}>', product.image.url, img_attrs)
+    if variants.get('svg'):
+        return format_html('<img src="{}" {}>', product.image.storage.url(variants['svg']), img_attrs)
+    if not variants.get('formats'):
+        return format_html('<img src="{}" {}>', product.image.url, img_attrs)
+
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+        (images.OUTPUT_FORMATS[fmt][1], images.srcset(product, fmt), sizes)
+        for fmt in variants['formats']
+        if fmt != images.FALLBACK_FORMAT
+    ))
+    # display: contents keeps <picture> out of the layout so the <img> classes apply as before
+    return format_html(
+        '<picture style="display: contents">{}<img src="{}" srcset="{}" sizes="{}" {}></picture>',
+        sources,
+        images.fallback_url(product, width),
+        images.srcset(product, images.FALLBACK_FORMAT),
+        sizes,
+        img_attrs,
+    )
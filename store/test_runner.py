@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class StoreTestRunner(DiscoverRunner):
+    """
+    Test runner that turns exceeded query budgets into test failures and
+    runs queued tasks as they are queued
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.STORE_QUERY_BUDGET_STRICT = True
+        settings.STORE_TASKS_SYNC = True
@@ -1,3 +1,1380 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.template import Context, Template, engines
+from django.test import (
+    AsyncClient, LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, include, path, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import urls as store_urls, views, wishlist_views
+from .admin_tools import EstimatedCountPaginator, estimated_count
+from .benchmark import compare_reports, run_benchmarks, seed_catalog
+from .cart import CartLine, hydrate_cart
+from .catalog_cache import CHANGED_AT_KEY, CSRF_PLACEHOLDER, bump_products, get_or_set, stats
+from .category_registry import VERSION_KEY as CATEGORY_VERSION_KEY, category_registry
+from .checks import check_shared_catalog_cache
+from .db_routers import PrimaryReplicaRouter, primary_reads
+from .images import variant_names
+from .instrumentation import QueryBudgetExceeded, RequestMetricsMiddleware, query_budget, view_stats
+from .inventory import InsufficientStock, place_order
+from .models import (
+    Category, CategorySales, CoPurchase, DailySales, Order, OrderItem, OrderStatusSales, Product,
+    ProductSales, Task, Wishlist,
+)
+from .pagination import paginate_products
+from .query_plans import full_scans
+from .recommendations import related_products
+from .search import autocomplete, build_match_query, search_products
+from .task_queue import claim, run_due, run_task, task
+from .warmup import template_names, warm_up
+from .wishlist import get_wishlist_ids
+
+
+def create_products(category, count, **kwargs):
+    """Create ``count`` products in ``category`` with sequential slugs"""
+    start = Product.objects.count()
+    return [
+        Product.objects.create(
+            category=category,
+            name=f'Product {start + i}',
+            slug=f'product-{start + i}',
+            description='Test product',
+            price=Decimal('10.00'),
+            stock=10,
+            **kwargs,
+        )
+        for i in range(count)
+    ]
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Books', slug='books')
+        cls.products = create_products(cls.category, 7)
+
+    def test_pages_cover_every_product_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_products(Product.objects.all(), cursor=cursor, per_page=3)
+            seen.extend(product.id for product in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, sorted((p.id for p in self.products), reverse=True))
+
+    def test_deep_page_is_single_query(self):
+        first = paginate_products(Product.objects.all(), per_page=3)
+        with self.assertNumQueries(1):
+            paginate_products(Product.objects.all(), cursor=first.next_cursor, per_page=3)
+
+    def test_product_page_endpoint(self):
+        first = paginate_products(Product.objects.filter(available=True), per_page=1)
+        response = self.client.get(reverse('store:product_page'), {'cursor': first.next_cursor})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertIn(self.products[-2].name, data['html'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('store:product_page'), {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('store:home'), {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_forged_cursor_and_unknown_category(self):
+        product = self.products[3]
+        forged = base64.urlsafe_b64encode(f'{product.created_at.isoformat()}|{product.id}'.encode()).decode()
+        response = self.client.get(reverse('store:product_page'), {'cursor': forged.rstrip('=')})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('store:product_page'), {'category': 'missing'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('store:home'), {'category': 'missing'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CartHydrationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Games', slug='games')
+        cls.products = create_products(cls.category, 20)
+
+    def fill_cart(self, products):
+        session = self.client.session
+        session['cart'] = {str(product.id): 1 for product in products}
+        session.save()
+
+    def test_hydrate_prunes_missing_and_skips_unavailable(self):
+        sold_out = self.products[1]
+        sold_out.stock = 0
+        sold_out.save()
+        cart = {
+            # Carts stored before compaction held a dict per line
+            str(self.products[0].id): {'price': '10.00', 'quantity': 2},
+            str(sold_out.id): 1,
+            '999999': 1,
+        }
+        with self.assertNumQueries(1):
+            lines, stale_ids = hydrate_cart(cart)
+        self.assertEqual([line.product for line in lines], [self.products[0]])
+        self.assertEqual(lines[0].item_total, Decimal('20.00'))
+        self.assertEqual(stale_ids, ['999999'])
+
+    def test_cart_view_query_count_is_constant(self):
+        category_registry.all()
+        # One query for the session and one shared by every product in the cart
+        for size in (1, 20):
+            self.fill_cart(self.products[:size])
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('store:cart'))
+            self.assertEqual(len(response.context['cart_items']), size)
+
+    def test_checkout_page_query_count_is_constant(self):
+        user = User.objects.create_user('shopper', password='secret')
+        self.client.force_login(user)
+        category_registry.all()
+        # Session, user and products
+        for size in (1, 20):
+            self.fill_cart(self.products[:size])
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('store:checkout'))
+            self.assertEqual(len(response.context['cart_items']), size)
+
+
+ORDER_FIELDS = {
+    'first_name': 'Test',
+    'last_name': 'User',
+    'email': 'test@example.com',
+    'address': '123 Test St',
+    'postal_code': '12345',
+    'city': 'Test City',
+}
+
+
+class StockReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='secret')
+        cls.category = Category.objects.create(name='Tools', slug='tools')
+        cls.products = create_products(cls.category, 3)
+
+    def lines(self, quantity):
+        return [CartLine(product, quantity, product.price) for product in self.products]
+
+    def test_place_order_reserves_stock(self):
+        order = place_order(self.user, self.lines(4), **ORDER_FIELDS)
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.subtotal, Decimal('120.00'))
+        self.assertEqual(order.total, Decimal('120.00'))
+        self.assertEqual(order.item_count, 12)
+        self.assertEqual(
+            sorted(Product.objects.values_list('stock', flat=True)), [6, 6, 6]
+        )
+
+    def test_insufficient_stock_rolls_back(self):
+        with self.assertRaises(InsufficientStock):
+            place_order(self.user, self.lines(11), **ORDER_FIELDS)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(
+            sorted(Product.objects.values_list('stock', flat=True)), [10, 10, 10]
+        )
+
+    @override_settings(STORE_TASKS_SYNC=False)
+    def test_query_count_is_constant(self):
+        # Lock, decrement, order insert and item bulk insert (plus savepoint);
+        # the rollups and co-purchases are queued after commit
+        with self.assertNumQueries(6), self.captureOnCommitCallbacks() as callbacks:
+            place_order(self.user, self.lines(3), **ORDER_FIELDS)
+        with self.assertNumQueries(2):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(Task.objects.count(), 2)
+
+
+class StockReservationStressTests(TransactionTestCase):
+    threads = 8
+    attempts_per_thread = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='secret')
+        category = Category.objects.create(name='Tools', slug='tools')
+        self.product = create_products(category, 1)[0]
+
+    def checkout_worker(self, results):
+        line = CartLine(self.product, 1, self.product.price)
+        try:
+            for _ in range(self.attempts_per_thread):
+                while True:
+                    try:
+                        place_order(self.user, [line], **ORDER_FIELDS)
+                        results.append(True)
+                    except ValidationError:
+                        results.append(False)
+                    except OperationalError:
+                        # SQLite reports write contention as "database is locked"
+                        time.sleep(0.001)
+                        continue
+                    break
+        finally:
+            connection.close()
+
+    def test_concurrent_checkouts_never_oversell(self):
+        results = []
+        workers = [
+            threading.Thread(target=self.checkout_worker, args=(results,))
+            for _ in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.product.refresh_from_db()
+        sold = sum(OrderItem.objects.values_list('quantity', flat=True))
+        self.assertEqual(len(results), self.threads * self.attempts_per_thread)
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(sold, 10)
+        self.assertEqual(self.product.stock, 0)
+
+
+class OrderTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='secret')
+        category = Category.objects.create(name='Toys', slug='toys')
+        cls.products = create_products(category, 3)
+
+    def create_order(self, quantity=1):
+        return place_order(
+            self.user,
+            [CartLine(product, quantity, product.price) for product in self.products],
+            **ORDER_FIELDS,
+        )
+
+    def test_backfill_order_totals(self):
+        order = self.create_order()
+        Order.objects.update(subtotal=0, shipping_cost=0, total=0, item_count=0)
+        call_command('backfill_order_totals', stdout=StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal, Decimal('30.00'))
+        self.assertEqual(order.shipping_cost, Decimal('5.99'))
+        self.assertEqual(order.total, Decimal('35.99'))
+        self.assertEqual(order.item_count, 3)
+
+    def test_order_history_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        category_registry.all()
+        # Session, user, count, orders, items and products
+        for _ in range(2):
+            self.create_order()
+            with self.assertNumQueries(6):
+                response = self.client.get(reverse('store:order_history'))
+            self.assertContains(response, '$35.99')
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Music', slug='music')
+        cls.product = create_products(cls.category, 1)[0]
+
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+
+    def test_home_served_from_cache(self):
+        self.client.get(reverse('store:home'))
+        # Anonymous visitors need no queries once the page is cached
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('store:home'))
+        self.assertContains(response, self.product.name)
+        self.assertGreater(stats.snapshot()['hits'], 0)
+
+    def test_product_save_invalidates(self):
+        self.client.get(reverse('store:home'))
+        self.product.name = 'Renamed Product'
+        self.product.save()
+        response = self.client.get(reverse('store:home'))
+        self.assertContains(response, 'Renamed Product')
+
+    def test_csrf_token_is_not_cached(self):
+        response = self.client.get(reverse('store:product_detail', args=[self.product.slug]))
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_checkout_only_invalidates_what_it_sold(self):
+        # In another category, so it is not recommended alongside the product sold
+        other = create_products(Category.objects.create(name='Film', slug='film'), 1)[0]
+        for product in (self.product, other):
+            self.client.get(reverse('store:product_detail', args=[product.slug]))
+        self.client.get(reverse('store:home'))
+        user = User.objects.create_user('buyer', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(user, [CartLine(self.product, 3, Decimal('10.00'))], **ORDER_FIELDS)
+
+        stats.reset()
+        response = self.client.get(reverse('store:product_detail', args=[other.slug]))
+        self.assertEqual(stats.snapshot()['misses'], 0)
+        response = self.client.get(reverse('store:product_detail', args=[self.product.slug]))
+        self.assertEqual(response.context['product'].stock, 7)
+        self.assertContains(response, '(7 available)')
+        self.assertContains(self.client.get(reverse('store:home')), '7 items available')
+
+    def test_deploy_check_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_catalog_cache(None)], ['store.E001'])
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.gettempdir(),
+        }}):
+            self.assertEqual(check_shared_catalog_cache(None), [])
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            backend = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cache_dir,
+            }}
+            with override_settings(CACHES=backend):
+                self.client.get(reverse('store:about'))
+                self.client.get(reverse('store:about'))
+                self.assertEqual(stats.snapshot()['hits'], 1)
+                self.product.save()
+                self.client.get(reverse('store:about'))
+                self.assertEqual(stats.snapshot()['misses'], 2)
+
+
+class CategoryRegistryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Garden', slug='garden')
+
+    def test_lookups_are_free_once_loaded(self):
+        category_registry.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(category_registry.get('garden'), self.category)
+            self.assertIsNone(category_registry.get('missing'))
+
+    def test_reloads_after_category_change(self):
+        category_registry.all()
+        Category.objects.create(name='Kitchen', slug='kitchen')
+        self.assertIsNotNone(category_registry.get('kitchen'))
+
+    def test_reloads_after_change_in_another_process(self):
+        category_registry.all()
+        # As another worker would: write, then bump the shared stamp
+        Category.objects.bulk_create([Category(name='Tools', slug='tools')])
+        cache.incr(CATEGORY_VERSION_KEY)
+        self.assertIsNotNone(category_registry.get('tools'))
+
+    def test_category_page_uses_registry(self):
+        create_products(self.category, 1)
+        self.client.get(reverse('store:category_products', args=['garden']))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('store:category_products', args=['garden']))
+        self.assertContains(response, 'Garden')
+        response = self.client.get(reverse('store:category_products', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.audio = Category.objects.create(name='Audio', slug='audio')
+        cls.books = Category.objects.create(name='Reading', slug='reading')
+        cls.headphones = Product.objects.create(
+            category=cls.audio, name='Wireless Headphones', slug='wireless-headphones',
+            description='Noise cancelling <b>over-ear</b> headphones', price=Decimal('199.99'), stock=5,
+        )
+        cls.speaker = Product.objects.create(
+            category=cls.audio, name='Wireless Speaker', slug='wireless-speaker',
+            description='Portable speaker', price=Decimal('59.99'), stock=5,
+        )
+        cls.book = Product.objects.create(
+            category=cls.books, name='Audio Engineering', slug='audio-engineering',
+            description='A book about wireless headphones and speakers', price=Decimal('29.99'), stock=5,
+        )
+
+    def test_match_query_escapes_syntax(self):
+        self.assertEqual(build_match_query('wire* OR "x'), '"wire" "or" "x"*')
+        self.assertIsNone(build_match_query('***'))
+
+    def test_ranking_prefers_name_matches(self):
+        results = search_products('headphones')
+        self.assertEqual([hit.product for hit in results.hits], [self.headphones, self.book])
+        self.assertEqual(results.total, 2)
+        self.assertIn('<mark>Headphones</mark>', results.hits[0].name_html)
+        self.assertIn('&lt;b&gt;', results.hits[0].snippet_html)
+
+    def test_category_facets(self):
+        results = search_products('wireless')
+        self.assertEqual(results.facets, [(self.audio.id, 2), (self.books.id, 1)])
+        filtered = search_products('wireless', category_id=self.books.id)
+        self.assertEqual([hit.product for hit in filtered.hits], [self.book])
+
+    def test_index_follows_product_changes(self):
+        self.speaker.available = False
+        self.speaker.save()
+        self.assertEqual(search_products('speaker').total, 1)
+        self.book.delete()
+        self.assertEqual(search_products('speaker').total, 0)
+
+    def test_autocomplete_prefix(self):
+        self.assertEqual(
+            sorted(autocomplete('wirel')),
+            [('Wireless Headphones', 'wireless-headphones'), ('Wireless Speaker', 'wireless-speaker')],
+        )
+
+    def test_search_views(self):
+        response = self.client.get(reverse('store:search'), {'q': 'speak', 'category': 'audio'})
+        self.assertContains(response, 'Wireless <mark>Speaker</mark>')
+        self.assertNotContains(response, '/product/audio-engineering/')
+        response = self.client.get(reverse('store:search_autocomplete'), {'q': 'audio'})
+        self.assertEqual(response.json()['suggestions'][0]['url'], '/product/audio-engineering/')
+
+
+class CartStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Pets', slug='pets')
+        cls.product = create_products(category, 1)[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def add_and_view(self):
+        self.client.post(reverse('store:add_to_cart', args=[self.product.slug]), {'quantity': 2})
+        response = self.client.get(reverse('store:cart'))
+        self.assertEqual(response.context['cart_count'], 2)
+        self.assertEqual(response.context['cart_items'][0].product, self.product)
+        return response
+
+    def test_session_storage_is_compact(self):
+        self.add_and_view()
+        self.assertEqual(self.client.session['cart'], {str(self.product.id): 2})
+
+    def test_browsing_without_cart_writes_no_session(self):
+        response = self.client.get(reverse('store:about'))
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    @override_settings(STORE_CART_STORAGE='store.cart_storage.SignedCookieCartStorage')
+    def test_signed_cookie_storage(self):
+        self.add_and_view()
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.client.get(reverse('store:clear_cart'))
+        response = self.client.get(reverse('store:cart'))
+        self.assertEqual(response.context['cart_count'], 0)
+
+    @override_settings(STORE_CART_STORAGE='store.cart_storage.CacheCartStorage')
+    def test_cache_storage(self):
+        self.add_and_view()
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        # The cart badge is read from the cache without touching the database
+        self.client.get(reverse('store:about'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('store:about'))
+        self.assertEqual(response.context['cart_count'], 2)
+
+    @override_settings(STORE_CART_STORAGE='store.cart_storage.SignedCookieCartStorage')
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies['cart'] = '{"1":99}'
+        response = self.client.get(reverse('store:cart'))
+        self.assertEqual(response.context['cart_count'], 0)
+
+
+ASYNC_VIEWS = {
+    'home': views.ahome,
+    'product_detail': views.aproduct_detail,
+    'quickview': views.aquickview,
+    'wishlist_status': wishlist_views.awishlist_status,
+    'add_to_wishlist': wishlist_views.aadd_to_wishlist,
+}
+
+
+class AsyncUrlconf:
+    """The store's URLs as ASGI deployments route them (STORE_ASYNC_VIEWS)"""
+    urlpatterns = [
+        path('', include(([
+            path(str(pattern.pattern), ASYNC_VIEWS.get(pattern.name, pattern.callback), name=pattern.name)
+            for pattern in store_urls.urlpatterns
+        ], 'store'))),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncUrlconf)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async', password='secret')
+        category = Category.objects.create(name='Sports', slug='sports')
+        cls.product = create_products(category, 1)[0]
+        Wishlist.objects.create(user=cls.user, product=cls.product)
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_catalog_views(self):
+        client = AsyncClient()
+        response = await client.get(reverse('store:home'))
+        self.assertContains(response, self.product.name)
+        response = await client.get(reverse('store:product_detail', args=[self.product.slug]))
+        self.assertContains(response, self.product.name)
+        response = await client.get(
+            reverse('store:quickview', args=[self.product.slug]),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertContains(response, self.product.name)
+        response = await client.get(reverse('store:product_detail', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_routes_async_views_only_when_asked(self):
+        self.assertIs(resolve(reverse('store:home')).func, views.ahome)
+        self.assertIs(store_urls.read_view(views.home, views.ahome), views.home)
+        with override_settings(STORE_ASYNC_VIEWS=True):
+            self.assertIs(store_urls.read_view(views.home, views.ahome), views.ahome)
+
+    async def test_wishlist_status(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(
+            reverse('store:add_to_wishlist', args=[self.product.id]),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertEqual(response.json(), {'success': True, 'in_wishlist': True})
+
+
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('revisit', password='secret')
+        category = Category.objects.create(name='Music', slug='music')
+        cls.product = create_products(category, 1)[0]
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('store:product_detail', args=[self.product.slug])
+
+    def test_anonymous_revalidation(self):
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache, public')
+        self.assertIn('Cookie', response.headers['Vary'])
+
+        # Revalidate the way a cookieless crawler does
+        self.client.cookies.clear()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        response = self.client.get(self.url, headers={'If-Modified-Since': response.headers['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+        self.product.category.name = 'Records'
+        self.product.category.save()
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertContains(response, 'Records')
+
+    def test_release_salt_changes_etag(self):
+        self.client.cookies.clear()
+        etag = self.client.get(self.url).headers['ETag']
+        with self.settings(STORE_ETAG_SALT='next-release'):
+            response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_visitor_state_changes_etag(self):
+        self.client.force_login(self.user)
+        # The first visit sets the CSRF cookie, which is part of the ETag
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertNotIn('Last-Modified', response.headers)
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+
+        self.client.post(reverse('store:add_to_cart', args=[self.product.slug]), {'quantity': 1})
+        # The flash message is shown first, then the new cart badge is a new version
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_quickview_fragment(self):
+        url = reverse('store:quickview', args=[self.product.slug])
+        headers = {'X-Requested-With': 'XMLHttpRequest'}
+        self.client.get(url, headers=headers)
+        response = self.client.get(url, headers=headers)
+        self.assertIn('X-Requested-With', response.headers['Vary'])
+        self.assertIn('private', response.headers['Cache-Control'])
+        response = self.client.get(url, headers={**headers, 'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('X-Requested-With', self.client.get(url).headers['Vary'])
+
+
+class WishlistStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('wisher', password='secret')
+        category = Category.objects.create(name='Garden', slug='garden')
+        cls.products = create_products(category, 4)
+        Wishlist.objects.create(user=cls.user, product=cls.products[0])
+        Wishlist.objects.create(user=cls.user, product=cls.products[2])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def status(self, products):
+        ids = ','.join(str(product.id) for product in products)
+        return self.client.get(reverse('store:wishlist_status'), {'ids': ids}).json()
+
+    def test_batch_status(self):
+        data = self.status(self.products)
+        self.assertEqual(data['wishlisted'], [self.products[0].id, self.products[2].id])
+
+    def test_cached_set_is_patched_incrementally(self):
+        self.assertEqual(len(get_wishlist_ids(self.user)), 2)
+        toggle = reverse('store:add_to_wishlist', args=[self.products[1].id])
+        headers = {'X-Requested-With': 'XMLHttpRequest'}
+        self.client.post(toggle, headers=headers)
+        self.client.post(
+            reverse('store:remove_from_wishlist', args=[self.products[0].id]), headers=headers,
+        )
+        with self.assertNumQueries(0):
+            ids = get_wishlist_ids(self.user)
+        self.assertEqual(ids, {self.products[1].id, self.products[2].id})
+
+    def test_anonymous_and_junk_ids(self):
+        self.client.logout()
+        self.assertEqual(self.status(self.products)['wishlisted'], [])
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('store:wishlist_status'), {'ids': 'x,,-1'})
+        self.assertEqual(response.json()['wishlisted'], [])
+
+
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Art', slug='art')
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = create_products(self.category, 1)[0]
+
+    def set_image(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.image.save(name, ContentFile(content))
+        self.product.refresh_from_db()
+
+    def png(self, width, height):
+        buffer = BytesIO()
+        Image.new('RGBA', (width, height), (200, 50, 50, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def render(self):
+        template = Template('{% load store_tags %}{% product_image product sizes="50vw" width=300 %}')
+        return template.render(Context({'product': self.product}))
+
+    def test_raster_variants_and_srcset(self):
+        self.set_image('poster.png', self.png(800, 600))
+        variants = self.product.image_variants
+        self.assertEqual(variants['source'], self.product.image.name)
+        self.assertIn('webp', variants['formats'])
+        self.assertEqual([width for width, _ in variants['formats']['jpeg']], [160, 320, 640, 800])
+        for name in variant_names(variants):
+            self.assertTrue(default_storage.exists(name))
+
+        html = self.render()
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('320w', html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('src="/media/products/variants/poster-320w.jpeg"', html)
+
+    def test_replacing_image_removes_old_variants(self):
+        self.set_image('first.png', self.png(200, 200))
+        old = variant_names(self.product.image_variants)
+        updated_at = self.product.updated_at
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.image.save('second.png', ContentFile(self.png(200, 200)))
+        # Cached pages may still point at the old files until the commit
+        self.assertTrue(all(default_storage.exists(name) for name in old))
+        for callback in callbacks:
+            callback()
+        self.product.refresh_from_db()
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        self.assertTrue(all('second' in name for name in variant_names(self.product.image_variants)))
+        self.assertGreater(self.product.updated_at, updated_at)
+
+        out = StringIO()
+        call_command('build_image_variants', '--force', stdout=out)
+        self.assertIn('Built variants for 1 of 1', out.getvalue())
+
+    def test_queued_rebuild_shows_the_original(self):
+        self.set_image('first.png', self.png(200, 200))
+        self.assertIn('<picture', self.render())
+        with self.settings(STORE_TASKS_SYNC=False):
+            self.product.image.save('second.png', ContentFile(self.png(200, 200)))
+        html = self.render()
+        self.assertNotIn('<picture', html)
+        self.assertIn(f'src="{self.product.image.url}"', html)
+
+    def test_svg_passthrough(self):
+        svg = b"""<?xml version="1.0"?>
+            <!-- exported by an editor -->
+            <svg width='40' height='40' xmlns='http://www.w3.org/2000/svg'>
+                <metadata>junk</metadata>
+                <rect width='40' height='40' fill='#ec4899'/>
+            </svg>
+        """
+        self.set_image('logo.svg', svg)
+        optimized = default_storage.open(self.product.image_variants['svg']).read()
+        self.assertLess(len(optimized), len(svg))
+        self.assertNotIn(b'exported', optimized)
+        self.assertIn(b"<rect width='40'", optimized)
+        self.assertIn('logo.svg', self.render())
+        self.assertNotIn('<picture', self.render())
+
+
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Office', slug='office')
+        create_products(category, 3)
+
+    def setUp(self):
+        cache.clear()
+        view_stats.reset()
+
+    @override_settings(STORE_SERVER_TIMING=True)
+    def test_request_metrics(self):
+        with self.assertLogs('store.requests', 'INFO') as logs:
+            response = self.client.get(reverse('store:home'), {'ref': 'mail'})
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'store:home')
+        self.assertEqual(record['path'], '/?ref=mail')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        self.assertIn('db;dur=', response.headers['Server-Timing'])
+        self.assertIn('total;dur=', response.headers['Server-Timing'])
+        self.assertEqual(view_stats.snapshot()['store:home']['count'], 1)
+
+        staff = User.objects.create_user('ops', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        metrics = self.client.get(reverse('store:request_metrics')).json()
+        self.assertIn('p95_ms', metrics['views']['store:home'])
+
+    def budget_middleware(self, limit):
+        @query_budget(limit)
+        def view(request):
+            list(Product.objects.all())
+            list(Category.objects.all())
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = RequestMetricsMiddleware(get_response)
+        return middleware
+
+    def test_query_budget(self):
+        request = RequestFactory().get('/')
+        self.assertEqual(self.budget_middleware(2)(request).status_code, 200)
+        with override_settings(STORE_QUERY_BUDGET_STRICT=True):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'ran 2 queries, over its budget of 1'):
+                self.budget_middleware(1)(request)
+        with override_settings(STORE_QUERY_BUDGET_STRICT=False):
+            with self.assertLogs('store.requests', 'WARNING'):
+                self.budget_middleware(1)(request)
+
+
+class BenchmarkTests(TestCase):
+    def test_scenarios_run_against_seeded_catalog(self):
+        dataset = seed_catalog(products=30, categories=3, users=1, cart_lines=4, orders_per_user=12)
+        self.assertEqual(Order.objects.filter(user=dataset.users[0]).count(), 12)
+        self.assertEqual(len(dataset.cart), 4)
+
+        results = run_benchmarks(dataset, iterations=3)
+        self.assertEqual(results['checkout']['statuses'], [302])
+        for name in ('home', 'category_products', 'product_detail', 'cart', 'order_history'):
+            self.assertEqual(results[name]['statuses'], [200], name)
+        self.assertEqual(Order.objects.filter(user=dataset.users[0]).count(), 12 + 4)
+
+    def test_compare_reports(self):
+        baseline = {'scenarios': {'home': {'p95_ms': 10.0, 'queries': 3}}}
+        self.assertEqual(compare_reports(baseline, {'scenarios': {'home': {'p95_ms': 11.0, 'queries': 3}}}), [])
+        regressions = compare_reports(baseline, {'scenarios': {'home': {'p95_ms': 13.0, 'queries': 4}}})
+        self.assertEqual(len(regressions), 2)
+
+
+class ReplayTests(LiveServerTestCase):
+    def test_replays_capture_and_groups_by_route(self):
+        category = Category.objects.create(name='Toys', slug='toys')
+        product = create_products(category, 1)[0]
+        lines = [
+            {'ts': 100.0, 'method': 'GET', 'path': '/'},
+            {'ts': 100.2, 'method': 'GET', 'path': f'/product/{product.slug}/'},
+            {'ts': 100.3, 'path': '/product/missing/'},
+            {'ts': 100.4, 'method': 'POST', 'path': '/cart/clear/'},
+            {'request_id': 'not-a-request', 'title': 'skipped'},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            capture = f'{directory}/capture.jsonl'
+            with open(capture, 'w') as f:
+                f.write('\n'.join(json.dumps(line) for line in lines) + '\n')
+            report_path = f'{directory}/report.json'
+            call_command(
+                'replay', capture, base_url=self.live_server_url, speed=10,
+                concurrency=2, output=report_path, stdout=StringIO(),
+            )
+            with open(report_path) as f:
+                report = json.load(f)
+
+        self.assertEqual(report['requests'], 3)
+        self.assertEqual(report['skipped_lines'], 2)
+        self.assertEqual(report['routes']['store:home']['statuses'], {'200': 1})
+        detail = report['routes']['store:product_detail']
+        self.assertEqual(detail['statuses'], {'200': 1, '404': 1})
+        self.assertEqual(sum(detail['histogram'].values()), 2)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Every hot query uses an index.', out.getvalue())
+
+    def test_full_scan_detection(self):
+        self.assertEqual(full_scans('2 0 0 SCAN store_order', 'sqlite'), ['store_order'])
+        self.assertEqual(full_scans('2 0 0 SCAN store_order USING INDEX order_recent_idx', 'sqlite'), [])
+        self.assertEqual(full_scans('Seq Scan on store_product  (cost=0.00..1.01)', 'postgresql'), ['store_product'])
+
+
+class CatalogApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Books', slug='books')
+        cls.products = create_products(cls.category, 3)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_product_list_and_detail(self):
+        data = self.client.get(reverse('store:api_products')).json()
+        self.assertEqual([row['slug'] for row in data['results']], ['product-2', 'product-1', 'product-0'])
+        self.assertEqual(data['results'][0]['price'], '10.00')
+        self.assertIsNone(data['next_cursor'])
+
+        detail = self.client.get(reverse('store:api_product', args=['product-0'])).json()
+        self.assertEqual(detail['description'], 'Test product')
+        self.assertEqual(detail['category'], 'books')
+        self.assertEqual(
+            self.client.get(reverse('store:api_product', args=['missing'])).status_code, 404,
+        )
+        categories = self.client.get(reverse('store:api_categories')).json()['results']
+        self.assertEqual(categories[0]['products'], reverse('store:api_category_products', args=['books']))
+
+    def test_conditional_get(self):
+        url = reverse('store:api_category_products', args=['books'])
+        response = self.client.get(url)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertNotIn('Last-Modified', response.headers)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        detail_url = reverse('store:api_product', args=['product-0'])
+        last_modified = self.client.get(detail_url).headers['Last-Modified']
+        response = self.client.get(detail_url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+        self.products[0].name = 'Renamed'
+        self.products[0].save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+        # Hiding a product makes no remaining row newer; the ETag still changes
+        etag = response.headers['ETag']
+        Product.objects.filter(pk=self.products[1].pk).update(available=False)
+        self.products[0].save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_unknown_category_is_not_found(self):
+        response = self.client.get(reverse('store:api_products'), {'category': 'missing'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_checkout_changes_etag(self):
+        url = reverse('store:api_product', args=['product-0'])
+        etag = self.client.get(url).headers['ETag']
+        user = User.objects.create_user('buyer', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(user, [CartLine(self.products[0], 1, Decimal('10.00'))], **ORDER_FIELDS)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stock'], 9)
+
+
+def with_replica():
+    return mock.patch.dict(settings.DATABASES, {'replica': {**settings.DATABASES['default']}})
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def test_routes_catalog_reads_to_replica(self):
+        router = PrimaryReplicaRouter()
+        with with_replica():
+            self.assertEqual(router.db_for_read(Product), 'replica')
+            self.assertEqual(router.db_for_read(Category), 'replica')
+            self.assertIsNone(router.db_for_read(Order))
+            self.assertIsNone(router.db_for_read(Wishlist))
+            self.assertEqual(router.db_for_write(Product), 'default')
+            self.assertFalse(router.allow_migrate('replica', 'store'))
+        # Without a replica configured every read stays on the primary
+        self.assertIsNone(router.db_for_read(Product))
+
+    def test_rebuilds_read_the_primary_just_after_a_change(self):
+        self.addCleanup(cache.clear)
+        router = PrimaryReplicaRouter()
+        with with_replica():
+            with primary_reads():
+                self.assertEqual(router.db_for_read(Product), 'default')
+            bump_products([1])
+            self.assertEqual(get_or_set(('routed', 1), lambda: router.db_for_read(Product)), 'default')
+            cache.set(CHANGED_AT_KEY, 0, timeout=None)
+            self.assertEqual(get_or_set(('routed', 2), lambda: router.db_for_read(Product)), 'replica')
+
+
+class ReplicaRouterTransactionTests(TestCase):
+    def test_catalog_reads_stay_on_primary_inside_transactions(self):
+        with with_replica():
+            self.assertEqual(PrimaryReplicaRouter().db_for_read(Product), 'default')
+
+
+class WarmUpTests(TestCase):
+    def test_warm_up_fills_template_cache_and_registry(self):
+        Category.objects.create(name='Toys', slug='toys')
+        report = warm_up()
+
+        backend = engines.all()[0]
+        names = list(template_names(backend))
+        self.assertIn('store/product_detail.html', names)
+        self.assertEqual(report['templates']['count'], len(names))
+        cached = backend.engine.template_loaders[0].get_template_cache
+        self.assertTrue(all(name in cached for name in names))
+        self.assertTrue(get_resolver()._populated)
+        self.assertEqual(report['categories']['count'], 1)
+        with self.assertNumQueries(0):
+            category_registry.get('toys')
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_load_hashed_script_bundles(self):
+        manifest = {
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+        }
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root, STORAGES=manifest):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            content = self.client.get(reverse('store:home')).content.decode()
+        self.assertRegex(content, r'/static/store/js/base\.[0-9a-f]{12}\.js')
+        self.assertRegex(content, r'/static/store/js/home\.[0-9a-f]{12}\.js')
+        self.assertRegex(content, r'/static/store/css/base\.[0-9a-f]{12}\.css')
+        self.assertNotIn('function showNotification', content)
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', password='secret')
+        books = Category.objects.create(name='Books', slug='books')
+        games = Category.objects.create(name='Games', slug='games')
+        cls.book, cls.other_book = create_products(books, 2)
+        cls.game, cls.dice = create_products(games, 2)
+
+    def setUp(self):
+        cache.clear()
+
+    def buy(self, *products):
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, [CartLine(product, 1, product.price) for product in products], **ORDER_FIELDS)
+
+    def test_orders_update_pairs_incrementally(self):
+        # Cold: same-category products only
+        self.assertEqual(related_products(self.book), [self.other_book])
+
+        self.buy(self.book, self.game)
+        self.buy(self.book, self.game, self.dice)
+        self.assertEqual(CoPurchase.objects.get(product=self.book, related=self.game).orders, 2)
+        self.assertEqual(CoPurchase.objects.get(product=self.dice, related=self.book).orders, 1)
+        self.assertEqual(related_products(self.book), [self.game, self.dice, self.other_book])
+
+        response = self.client.get(reverse('store:product_detail', args=[self.book.slug]))
+        self.assertEqual(response.context['related_products'], [self.game, self.dice, self.other_book])
+        self.assertContains(response, 'Frequently Bought Together')
+
+    def test_rebuild_matches_incremental_counts(self):
+        self.buy(self.book, self.game)
+        self.buy(self.game, self.dice, self.book)
+        incremental = set(CoPurchase.objects.values_list('product_id', 'related_id', 'orders'))
+
+        out = StringIO()
+        call_command('rebuild_recommendations', stdout=out)
+        self.assertIn('Stored 6 product pairs', out.getvalue())
+        self.assertEqual(set(CoPurchase.objects.values_list('product_id', 'related_id', 'orders')), incremental)
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', password='secret')
+        books = Category.objects.create(name='Books', slug='books')
+        games = Category.objects.create(name='Games', slug='games')
+        cls.book, cls.other_book = create_products(books, 2)
+        cls.game = create_products(games, 1)[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def buy(self, *lines):
+        return place_order(
+            self.user, [CartLine(product, quantity, product.price) for product, quantity in lines], **ORDER_FIELDS
+        )
+
+    def rollups(self):
+        return {
+            'daily': set(DailySales.objects.values_list('date', 'orders', 'units', 'revenue', 'shipping')),
+            'products': set(ProductSales.objects.filter(units__gt=0).values_list('product_id', 'units', 'revenue')),
+            'categories': set(CategorySales.objects.filter(units__gt=0).values_list('category_id', 'units', 'revenue')),
+            'statuses': set(OrderStatusSales.objects.filter(orders__gt=0).values_list('status', 'orders', 'revenue')),
+        }
+
+    def test_backfill_matches_incremental_rollups(self):
+        first = self.buy((self.book, 2), (self.game, 1))
+        self.buy((self.book, 1), (self.other_book, 3))
+        incremental = self.rollups()
+        self.assertEqual(ProductSales.objects.get(product=self.book).units, 3)
+        self.assertEqual(
+            DailySales.objects.get().revenue,
+            first.subtotal + Order.objects.exclude(pk=first.pk).get().subtotal,
+        )
+
+        out = StringIO()
+        call_command('backfill_sales_rollups', stdout=out)
+        self.assertIn('Stored 1 dailysales', out.getvalue())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_cancelling_and_deleting_orders(self):
+        order = self.buy((self.book, 2))
+        kept = self.buy((self.game, 1))
+
+        order = Order.objects.get(pk=order.pk)
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(ProductSales.objects.get(product=self.book).units, 0)
+        self.assertEqual(DailySales.objects.get().orders, 1)
+        self.assertEqual(OrderStatusSales.objects.get(status='cancelled').orders, 1)
+        self.assertEqual(OrderStatusSales.objects.get(status='pending').orders, 1)
+
+        order.status = 'processing'
+        order.save()
+        self.assertEqual(ProductSales.objects.get(product=self.book).units, 2)
+        self.assertEqual(DailySales.objects.get().orders, 2)
+
+        Order.objects.get(pk=kept.pk).delete()
+        incremental = self.rollups()
+        self.assertEqual(incremental['categories'], {(self.book.category_id, 2, self.book.price * 2)})
+        call_command('backfill_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_dashboard_reads_only_rollups(self):
+        self.buy((self.book, 2), (self.game, 1))
+        staff = User.objects.create_user('ops', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('store:sales_dashboard'), {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['days'], 7)
+        self.assertEqual(response.context['totals']['units'], 3)
+        self.assertContains(response, self.game.name)
+        self.assertFalse([q['sql'] for q in queries if 'store_orderitem' in q['sql'] or 'store_order"' in q['sql']])
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('store:sales_dashboard')).status_code, 302)
+
+
+class CatalogImportExportTests(TestCase):
+    feed = (
+        'slug,name,category,category_name,price,stock\n'
+        'desk-lamp,Desk Lamp,lighting,Lighting,24.50,7\n'
+        'floor-lamp,Floor Lamp,lighting,,89.00,\n'
+        'broken,Broken,lighting,,not-a-price,1\n'
+        'stool,Stool,furniture,,35,2\n'
+        'desk-lamp,Desk Lamp XL,lighting,,29.99,3\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+
+    def write_feed(self, content, suffix):
+        feed = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        with feed:
+            feed.write(content)
+        self.addCleanup(os.remove, feed.name)
+        return feed.name
+
+    def test_import_upserts_in_chunks(self):
+        Category.objects.create(name='Furniture', slug='furniture')
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', self.write_feed(self.feed, '.csv'), batch_size=2, stdout=out, stderr=err)
+        self.assertIn('Imported 5 rows (3 created, 1 updated, 1 skipped)', out.getvalue())
+        self.assertIn('Line 4: price', err.getvalue())
+
+        lamp = Product.objects.get(slug='desk-lamp')
+        self.assertEqual((lamp.name, lamp.price, lamp.stock), ('Desk Lamp XL', Decimal('29.99'), 3))
+        self.assertEqual(lamp.category.name, 'Lighting')
+        self.assertEqual(Product.objects.get(slug='floor-lamp').stock, 0)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual([hit.product.slug for hit in search_products('stool').hits], ['stool'])
+
+        # A feed without a stock column leaves stock alone
+        call_command(
+            'import_catalog', self.write_feed('{"slug": "stool", "name": "Bar Stool", "category": "furniture", '
+                                              '"price": 40}\n', '.jsonl'),
+            stdout=StringIO(),
+        )
+        stool = Product.objects.get(slug='stool')
+        self.assertEqual((stool.name, stool.stock), ('Bar Stool', 2))
+
+    def test_export_round_trips(self):
+        category = Category.objects.create(name='Office', slug='office')
+        create_products(category, 3, available=False)
+        before = list(Product.objects.order_by('slug').values_list(
+            'slug', 'name', 'description', 'price', 'stock', 'available', 'category_id'
+        ))
+
+        for fmt in ('csv', 'jsonl'):
+            path = self.write_feed('', f'.{fmt}')
+            out = StringIO()
+            call_command('export_catalog', path, stdout=out)
+            self.assertIn('Exported 3 products', out.getvalue())
+            Product.objects.update(name='Changed', stock=0, available=True)
+
+            out = StringIO()
+            with self.assertNumQueries(11):
+                # Categories, then one chunk: category upsert, existing products and
+                # product upsert, then the search index rebuild (each plus savepoint)
+                call_command('import_catalog', path, stdout=out)
+            self.assertIn('(0 created, 3 updated, 0 skipped)', out.getvalue())
+            self.assertEqual(list(Product.objects.order_by('slug').values_list(
+                'slug', 'name', 'description', 'price', 'stock', 'available', 'category_id'
+            )), before)
+
+
+class AdminPerformanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        category = Category.objects.create(name='Lighting', slug='lighting')
+        cls.lamp, cls.bulb = create_products(category, 2)
+        Product.objects.filter(pk=cls.lamp.pk).update(name='Desk Lamp')
+        Product.objects.filter(pk=cls.bulb.pk).update(name='Bulb')
+        cls.order = place_order(
+            cls.staff, [CartLine(cls.lamp, 2, cls.lamp.price)], **{**ORDER_FIELDS, 'last_name': 'Smith'},
+        )
+        place_order(cls.staff, [CartLine(cls.bulb, 1, cls.bulb.price)], **ORDER_FIELDS)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.staff)
+
+    def changelist(self, model, **params):
+        return self.client.get(reverse(f'admin:store_{model}_changelist'), params)
+
+    def test_typed_search(self):
+        response = self.changelist('order', q=str(self.order.pk))
+        self.assertEqual([o.pk for o in response.context['cl'].result_list], [self.order.pk])
+        response = self.changelist('order', q='SMI')
+        self.assertEqual([o.pk for o in response.context['cl'].result_list], [self.order.pk])
+        self.assertContains(response, 'Total incl. shipping')
+        self.assertContains(response, f'${self.order.total:.2f}')
+        response = self.changelist('product', q='desk')
+        self.assertEqual(list(response.context['cl'].result_list), [self.lamp])
+        # Prefix, not substring
+        self.assertFalse(self.changelist('product', q='lamp').context['cl'].result_list)
+
+        response = self.changelist('orderitem', q=str(self.order.pk))
+        item = response.context['cl'].result_list[0]
+        self.assertEqual(item.cost, self.lamp.price * 2)
+        self.assertContains(response, f'Order {self.order.pk}')
+
+    def test_changelist_skips_total_count_and_estimates_large_tables(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.changelist('order')
+        self.assertEqual(sum('COUNT(*)' in q['sql'] for q in queries), 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            # Partial indexes over available products count only those; list them first
+            cursor.execute("SELECT idx, stat FROM sqlite_stat1 WHERE tbl = 'store_product'")
+            stats = sorted(cursor.fetchall(), key=lambda row: not row[0].startswith('product_live'))
+            cursor.execute("DELETE FROM sqlite_stat1 WHERE tbl = 'store_product'")
+            cursor.executemany(
+                "INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES ('store_product', %s, %s)",
+                [(idx, '1 1' if idx.startswith('product_live') else stat) for idx, stat in stats],
+            )
+        self.assertEqual(estimated_count(Product), 2)
+        create_products(Category.objects.get(), 3)
+        paginator = EstimatedCountPaginator(Product.objects.all(), 100)
+        with mock.patch('store.admin_tools.ESTIMATE_COUNTS_ABOVE', 1):
+            # The statistics predate the new rows
+            self.assertEqual(paginator.count, 2)
+            self.assertEqual(EstimatedCountPaginator(Product.objects.filter(available=True), 100).count, 5)
+        self.assertEqual(EstimatedCountPaginator(Product.objects.all(), 100).count, 5)
+
+    def test_csv_export_streams(self):
+        response = self.client.post(reverse('admin:store_order_changelist'), {
+            'action': 'export_csv', '_selected_action': [self.order.pk],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'created_at', 'user__username'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn(f'{self.order.pk},', lines[1])
+        self.assertIn('Smith', lines[1])
+
+
+TASK_CALLS = []
+
+
+@task(max_attempts=2)
+def remember(label, failures=0):
+    TASK_CALLS.append(label)
+    if TASK_CALLS.count(label) <= failures:
+        raise RuntimeError(f'{label} failed')
+
+
+@task()
+def add_category(slug):
+    Category.objects.create(name=slug, slug=slug)
+
+
+@override_settings(STORE_TASKS_SYNC=False)
+class TaskQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', password='secret')
+        category = Category.objects.create(name='Games', slug='games')
+        cls.products = create_products(category, 2)
+
+    def setUp(self):
+        TASK_CALLS.clear()
+
+    def test_checkout_work_runs_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            place_order(self.user, [CartLine(p, 1, p.price) for p in self.products], **ORDER_FIELDS)
+        self.assertFalse(Task.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertFalse(ProductSales.objects.exists())
+
+        self.assertEqual(run_due(), (2, 0))
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(ProductSales.objects.get(product=self.products[0]).units, 1)
+        self.assertEqual(CoPurchase.objects.count(), 2)
+
+    def test_failed_task_is_retried_with_backoff(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.enqueue('flaky', failures=5)
+        with self.assertLogs('store.task_queue', 'WARNING'):
+            self.assertEqual(run_due(), (0, 1))
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (Task.QUEUED, 1))
+        self.assertIn('RuntimeError: flaky failed', queued.last_error)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertEqual(run_due(), (0, 0))
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('store.task_queue', 'ERROR'):
+            run_due()
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertEqual(TASK_CALLS, ['flaky', 'flaky'])
+
+    def test_abandoned_claims_run_again(self):
+        Task.objects.create(
+            name=remember.task_name, args=['orphan'], status=Task.RUNNING, attempts=1,
+            claimed_by='gone', run_at=timezone.now() - timedelta(seconds=1),
+        )
+        Task.objects.create(
+            name=remember.task_name, args=['busy'], status=Task.RUNNING, attempts=1,
+            claimed_by='alive', run_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(run_due(), (1, 0))
+        self.assertEqual(TASK_CALLS, ['orphan'])
+        self.assertEqual(Task.objects.get().claimed_by, 'alive')
+
+    def test_run_that_lost_its_lease_rolls_back(self):
+        Task.objects.create(name=add_category.task_name, args=['late'])
+        [claimed] = claim(1, lease=0)
+        # The lease ran out and another worker claimed the task meanwhile
+        Task.objects.update(claimed_by='other')
+        with self.assertLogs('store.task_queue', 'WARNING'):
+            self.assertIsNone(run_task(claimed))
+        self.assertFalse(Category.objects.filter(slug='late').exists())
+        self.assertEqual(Task.objects.get().claimed_by, 'other')
+
+    @override_settings(STORE_TASKS_SYNC=True)
+    def test_sync_mode_runs_inline_with_queued_types(self):
+        remember.enqueue(Decimal('1.50'))
+        self.assertEqual(TASK_CALLS, ['1.50'])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(STORE_TASKS_SYNC=False)
+class RunWorkerTests(TransactionTestCase):
+    def test_burst_drains_the_queue(self):
+        TASK_CALLS.clear()
+        for label in ('a', 'b', 'c'):
+            Task.objects.create(name=remember.task_name, args=[label])
+        out = StringIO()
+        # One thread: the in-memory test database reports lock conflicts
+        # between connections instead of waiting them out
+        call_command('run_worker', burst=True, concurrency=1, stdout=out)
+        self.assertIn('Ran 3 tasks: 3 succeeded, 0 failed.', out.getvalue())
+        self.assertEqual(sorted(TASK_CALLS), ['a', 'b', 'c'])
+        self.assertFalse(Task.objects.exists())
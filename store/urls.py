@@ -1,17 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from . import cart_views
 from . import checkout_views
 from . import auth_views
 from . import wishlist_views
+from . import staff_views
+from . import api_views
 
 app_name = 'store'
 
+
+def read_view(sync_view, async_view):
+    """The async version of a read view under ASGI (STORE_ASYNC_VIEWS), the sync one otherwise"""
+    return async_view if settings.STORE_ASYNC_VIEWS else sync_view
+
+
 urlpatterns = [
-    path('', views.home, name='home'),
+    path('', read_view(views.home, views.ahome), name='home'),
     path('category/<slug:category_slug>/', views.category_products, name='category_products'),
-    path('product/<slug:product_slug>/', views.product_detail, name='product_detail'),
-    path('quickview/<slug:product_slug>/', views.quickview, name='quickview'),
+    path('products/page/', views.product_page, name='product_page'),
+    path('product/<slug:product_slug>/', read_view(views.product_detail, views.aproduct_detail),
+         name='product_detail'),
+    path('quickview/<slug:product_slug>/', read_view(views.quickview, views.aquickview), name='quickview'),
+    path('search/', views.search, name='search'),
+    path('search/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
     path('wishlist/', views.wishlist, name='wishlist'),
@@ -27,7 +40,17 @@ urlpatterns = [
     path('checkout/', checkout_views.checkout, name='checkout'),
     path('order/<int:order_id>/confirmation/', checkout_views.order_confirmation, name='order_confirmation'),
     path('orders/', checkout_views.order_history, name='order_history'),
-    path('wishlist/add/<int:product_id>/', wishlist_views.add_to_wishlist, name='add_to_wishlist'),
+    path('wishlist/status/', read_view(wishlist_views.wishlist_status, wishlist_views.awishlist_status),
+         name='wishlist_status'),
+    path('wishlist/add/<int:product_id>/', read_view(wishlist_views.add_to_wishlist, wishlist_views.aadd_to_wishlist),
+         name='add_to_wishlist'),
     path('wishlist/remove/<int:product_id>/', wishlist_views.remove_from_wishlist, name='remove_from_wishlist'),
     path('share/<slug:product_slug>/', wishlist_views.share_product, name='share_product'),
+    path('api/products/', api_views.product_list, name='api_products'),
+    path('api/products/<slug:product_slug>/', api_views.product_detail, name='api_product'),
+    path('api/categories/', api_views.category_list, name='api_categories'),
+    path('api/categories/<slug:category_slug>/products/', api_views.category_products,
+         name='api_category_products'),
+    path('staff/metrics/', staff_views.request_metrics, name='request_metrics'),
+    path('staff/sales/', staff_views.sales_dashboard, name='sales_dashboard'),
 ]
\ No newline at end of file
@@ -1,77 +1,319 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, aget_object_or_404, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from .models import Product, Category
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.urls import reverse
+from .catalog_cache import CSRF_PLACEHOLDER, aget_or_set, get_or_set, render_fragment
+from .category_registry import category_registry
+from .conditional import add_cache_headers, csrf_cookie, not_modified, page_validators, visitor_state
+from .instrumentation import query_budget
+from .models import Product
+from .pagination import InvalidCursor, apaginate_products, decode_cursor, paginate_products
+from .recommendations import arelated_products, related_products
+from .search import autocomplete, search_products
 
+SEARCH_RESULTS_PER_PAGE = 24
 
-def home(request):
-    # Get all products and categories
-    products = Product.objects.filter(available=True).select_related('category')
-    categories = Category.objects.all()
+
+def page_cursor(request):
+    """The ?cursor= of a product grid request, raising InvalidCursor for one this site did not issue"""
+    cursor = request.GET.get('cursor')
+    if cursor:
+        # Checked before it becomes part of a cache key
+        decode_cursor(cursor)
+    return cursor
+
+
+def get_product_page(request, category_slug=None):
+    """
+    Get one keyset page of available products, optionally for a category;
+    ``category_slug`` must be a known category's
+    """
+    cursor = page_cursor(request)
+    
+    def build_page():
+        products = Product.objects.filter(available=True).select_related('category')
+        if category_slug:
+            products = products.filter(category__slug=category_slug)
+        return paginate_products(products, cursor=cursor)
+    
+    return get_or_set(('products', category_slug, cursor), build_page, depends=lambda page: page)
+
+
+async def aget_product_page(request, category_slug=None):
+    """Async version of get_product_page"""
+    cursor = page_cursor(request)
+    
+    async def build_page():
+        products = Product.objects.filter(available=True).select_related('category')
+        if category_slug:
+            products = products.filter(category__slug=category_slug)
+        return await apaginate_products(products, cursor=cursor)
     
+    return await aget_or_set(('products', category_slug, cursor), build_page, depends=lambda page: page)
+
+
+def get_catalog_product(product_slug):
+    """Get an available product by slug, raising 404 if there is none"""
+    return get_or_set(
+        ('product', product_slug),
+        lambda: get_object_or_404(Product.objects.select_related('category'), slug=product_slug, available=True),
+        depends=lambda product: product,
+    )
+
+
+async def aget_catalog_product(product_slug):
+    """Async version of get_catalog_product"""
+    return await aget_or_set(
+        ('product', product_slug),
+        lambda: aget_object_or_404(Product.objects.select_related('category'), slug=product_slug, available=True),
+        depends=lambda product: product,
+    )
+
+
+async def arender(request, template_name, context=None):
+    """Render from an async view; context processors still use the sync session and ORM"""
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def product_page_validators(request, product, related):
+    """ETag and Last-Modified of a full product page, or (None, None) if it must be rendered"""
+    visitor = visitor_state(request)
+    if visitor is None:
+        return None, None
+    return page_validators(product, category_registry.all(), visitor, related)
+
+
+aproduct_page_validators = sync_to_async(product_page_validators)
+
+
+# The catalog reads below come in pairs. The sync view is routed under WSGI,
+# where an async view would cost a thread hop per request; the async one
+# under ASGI (STORE_ASYNC_VIEWS), where it frees the worker while waiting
+
+@query_budget(5)
+def home(request):
     # Get selected category from query params
     category_slug = request.GET.get('category')
-    if category_slug:
-        products = products.filter(category__slug=category_slug)
+    if category_slug and category_registry.get(category_slug) is None:
+        raise Http404('No category matches the given query.')
+    try:
+        products = get_product_page(request, category_slug)
+    except InvalidCursor:
+        raise Http404('Invalid page cursor')
     
     context = {
         'products': products,
-        'categories': categories,
         'selected_category': category_slug,
     }
     return render(request, 'store/home.html', context)
 
 
+@query_budget(5)
+async def ahome(request):
+    """Async version of home"""
+    category_slug = request.GET.get('category')
+    if category_slug and await sync_to_async(category_registry.get)(category_slug) is None:
+        raise Http404('No category matches the given query.')
+    try:
+        products = await aget_product_page(request, category_slug)
+    except InvalidCursor:
+        raise Http404('Invalid page cursor')
+    
+    context = {
+        'products': products,
+        'selected_category': category_slug,
+    }
+    return await arender(request, 'store/home.html', context)
+
+
+@query_budget(5)
 def category_products(request, category_slug):
-    category = get_object_or_404(Category, slug=category_slug)
-    products = Product.objects.filter(category=category, available=True).select_related('category')
-    categories = Category.objects.all()
+    category = category_registry.get(category_slug)
+    if category is None:
+        raise Http404('No category matches the given query.')
+    try:
+        products = get_product_page(request, category_slug)
+    except InvalidCursor:
+        raise Http404('Invalid page cursor')
     
     context = {
         'products': products,
-        'categories': categories,
         'selected_category': category_slug,
         'current_category': category,
     }
     return render(request, 'store/home.html', context)
 
 
+@query_budget(3)
+def product_page(request):
+    """Next page of the product grid for infinite scroll (AJAX)"""
+    category_slug = request.GET.get('category')
+    if category_slug and category_registry.get(category_slug) is None:
+        return JsonResponse({'success': False, 'message': 'Unknown category'}, status=400)
+    try:
+        products = get_product_page(request, category_slug)
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'message': 'Invalid cursor'}, status=400)
+    
+    html = render_fragment(
+        ('cards', category_slug, request.GET.get('cursor')),
+        lambda: render_to_string('store/partials/product_cards.html', {
+            'products': products,
+            'csrf_token': CSRF_PLACEHOLDER,
+        }),
+        get_token(request),
+        showing=products,
+    )
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'count': len(products),
+        'next_cursor': products.next_cursor,
+    })
+
+
+@query_budget(6)
 def product_detail(request, product_slug):
-    product = get_object_or_404(Product, slug=product_slug, available=True)
+    product = get_catalog_product(product_slug)
+    related = get_or_set(
+        ('related', product.id), lambda: related_products(product),
+        depends=lambda related: [product, related],
+    )
+    etag, last_modified = product_page_validators(request, product, related)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return add_cache_headers(request, response, 'page', etag, last_modified)
     
-    # Get related products from same category
-    related_products = Product.objects.filter(
-        category=product.category, 
-        available=True
-    ).exclude(id=product.id)[:4]
+    context = {
+        'product': product,
+        'related_products': related,
+    }
+    response = render(request, 'store/product_detail.html', context)
+    return add_cache_headers(request, response, 'page', etag, last_modified)
+
+
+@query_budget(6)
+async def aproduct_detail(request, product_slug):
+    """Async version of product_detail"""
+    product = await aget_catalog_product(product_slug)
+    related = await aget_or_set(
+        ('related', product.id), lambda: arelated_products(product),
+        depends=lambda related: [product, related],
+    )
+    etag, last_modified = await aproduct_page_validators(request, product, related)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return add_cache_headers(request, response, 'page', etag, last_modified)
     
     context = {
         'product': product,
-        'related_products': related_products,
+        'related_products': related,
     }
-    return render(request, 'store/product_detail.html', context)
+    response = await arender(request, 'store/product_detail.html', context)
+    return add_cache_headers(request, response, 'page', etag, last_modified)
 
 
+@query_budget(3)
 def about(request):
     """About us page"""
     return render(request, 'store/about.html')
 
 
+@query_budget(3)
 def contact(request):
     """Contact us page"""
     return render(request, 'store/contact.html')
 
 
+@query_budget(4)
 def quickview(request, product_slug):
     """Quick view for product (AJAX)"""
-    product = get_object_or_404(Product, slug=product_slug, available=True)
+    product = get_catalog_product(product_slug)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return render(request, 'store/partials/quickview.html', {'product': product})
+        # The fragment has no page chrome; only its CSRF token is per visitor
+        etag, last_modified = page_validators(product, visitor=(csrf_cookie(request),))
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = render(request, 'store/partials/quickview.html', {'product': product})
+        return add_cache_headers(
+            request, response, 'fragment', etag, last_modified, vary=('X-Requested-With',),
+        )
     
     # If not AJAX request, redirect to product detail
-    return redirect('store:product_detail', product_slug=product_slug)
+    response = redirect('store:product_detail', product_slug=product_slug)
+    return add_cache_headers(request, response, 'fragment', vary=('X-Requested-With',))
+
+
+@query_budget(4)
+async def aquickview(request, product_slug):
+    """Async version of quickview"""
+    product = await aget_catalog_product(product_slug)
+    
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        etag, last_modified = page_validators(product, visitor=(csrf_cookie(request),))
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = await arender(request, 'store/partials/quickview.html', {'product': product})
+        return add_cache_headers(
+            request, response, 'fragment', etag, last_modified, vary=('X-Requested-With',),
+        )
+    
+    response = redirect('store:product_detail', product_slug=product_slug)
+    return add_cache_headers(request, response, 'fragment', vary=('X-Requested-With',))
+
+
+@query_budget(6)
+def search(request):
+    """Product search results with category facets"""
+    query = request.GET.get('q', '').strip()
+    category = category_registry.get(request.GET.get('category', ''))
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    
+    results = search_products(
+        query,
+        category_id=category.id if category else None,
+        limit=SEARCH_RESULTS_PER_PAGE,
+        offset=(page - 1) * SEARCH_RESULTS_PER_PAGE,
+    ) if query else None
+    
+    facets = []
+    if results:
+        for category_id, count in results.facets:
+            facet_category = category_registry.get_by_id(category_id)
+            if facet_category:
+                facets.append({'category': facet_category, 'count': count})
+    
+    context = {
+        'query': query,
+        'results': results,
+        'facets': facets,
+        'selected_category': category.slug if category else None,
+        'page': page,
+        'has_previous': page > 1,
+        'has_next': bool(results) and page * SEARCH_RESULTS_PER_PAGE < results.total,
+    }
+    return render(request, 'store/search.html', context)
+
+
+@query_budget(3)
+def search_autocomplete(request):
+    """Product name suggestions for the search box (AJAX)"""
+    query = request.GET.get('q', '').strip()
+    suggestions = [
+        {'name': name, 'url': reverse('store:product_detail', args=[slug])}
+        for name, slug in autocomplete(query)
+    ] if len(query) >= 2 else []
+    return JsonResponse({'success': True, 'suggestions': suggestions})
 
 
+@query_budget(5)
 @login_required
 @login_required
 def wishlist(request):
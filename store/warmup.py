@@ -0,0 +1,81 @@
+"""
+Warm a freshly started worker before it serves traffic.
+
+A new process compiles each template the first time it renders it, builds
+the URL resolver on the first ``reverse()`` or ``resolve()`` and loads the
+category registry on the first page view, all at the expense of its first
+visitors. ``warm_up`` does the three up front. Under gunicorn with
+``preload_app`` (see gunicorn.conf.py) it runs once in the master process,
+and every forked worker inherits the results copy-on-write.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.db import DatabaseError
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+from .category_registry import category_registry
+
+logger = logging.getLogger('store.warmup')
+
+
+def template_names(backend):
+    """Names of every template file under the backend's DIRS"""
+    for directory in backend.engine.dirs:
+        root = Path(directory)
+        for path in sorted(root.rglob('*')):
+            if path.is_file():
+                yield path.relative_to(root).as_posix()
+
+
+def compile_templates():
+    """Load every project template into the cached template loader"""
+    compiled = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend):
+            try:
+                backend.get_template(name)
+            except TemplateSyntaxError as e:
+                logger.warning('Could not compile template %s: %s', name, e)
+            else:
+                compiled += 1
+    return compiled
+
+
+def build_url_resolver():
+    """Populate the URL resolver's reverse lookup tables"""
+    return len(get_resolver().reverse_dict)
+
+
+def load_categories():
+    """Fill the category registry, if the database is reachable"""
+    try:
+        return len(category_registry.all())
+    except DatabaseError as e:
+        logger.warning('Could not load the category registry: %s', e)
+        return 0
+
+
+WARM_UP_STEPS = [
+    ('templates', compile_templates),
+    ('url_resolver', build_url_resolver),
+    ('categories', load_categories),
+]
+
+
+def warm_up():
+    """Run each warm-up step; returns {step: {'count': n, 'ms': duration}}"""
+    report = {}
+    for step, run in WARM_UP_STEPS:
+        started = time.perf_counter()
+        count = run()
+        report[step] = {'count': count, 'ms': round((time.perf_counter() - started) * 1000, 2)}
+    logger.info('Warm-up finished: %s', ', '.join(
+        f"{step} {result['count']} in {result['ms']} ms" for step, result in report.items()
+    ))
+    return report
@@ -0,0 +1,80 @@
+"""
+Per-user cache of wishlisted product ids.
+
+Each user's wishlist is cached as a frozenset of product ids, loaded with one
+query over the (user, product) unique index on first use. Adding or removing
+a wishlist row patches the cached set in place (see store.signals) rather
+than dropping it, so status checks for a whole grid stay a single cache read.
+"""
+from django.conf import settings
+
+from .catalog_cache import get_cache
+from .models import Wishlist
+
+
+WISHLIST_CACHE_TIMEOUT = getattr(settings, 'STORE_WISHLIST_CACHE_TIMEOUT', 60 * 60)
+
+# Upper bound on ids accepted by one status request
+MAX_STATUS_IDS = 200
+
+
+def _key(user_id):
+    return f'store:wishlist:{user_id}'
+
+
+def _query_ids(user_id):
+    return Wishlist.objects.filter(user_id=user_id).values_list('product_id', flat=True)
+
+
+def get_wishlist_ids(user):
+    """The set of product ids ``user`` has wishlisted"""
+    if not user.is_authenticated:
+        return frozenset()
+    cache = get_cache()
+    ids = cache.get(_key(user.id))
+    if ids is None:
+        ids = frozenset(_query_ids(user.id))
+        cache.set(_key(user.id), ids, WISHLIST_CACHE_TIMEOUT)
+    return ids
+
+
+async def aget_wishlist_ids(user):
+    """Async version of get_wishlist_ids"""
+    if not user.is_authenticated:
+        return frozenset()
+    cache = get_cache()
+    ids = await cache.aget(_key(user.id))
+    if ids is None:
+        ids = frozenset([product_id async for product_id in _query_ids(user.id)])
+        await cache.aset(_key(user.id), ids, WISHLIST_CACHE_TIMEOUT)
+    return ids
+
+
+def _patch(user_id, update):
+    # A missing set is left missing; the next read loads it from the database
+    cache = get_cache()
+    ids = cache.get(_key(user_id))
+    if ids is not None:
+        cache.set(_key(user_id), update(ids), WISHLIST_CACHE_TIMEOUT)
+
+
+def add_wishlist_id(user_id, product_id):
+    """Record ``product_id`` in the cached wishlist of ``user_id``"""
+    _patch(user_id, lambda ids: ids | {product_id})
+
+
+def discard_wishlist_id(user_id, product_id):
+    """Remove ``product_id`` from the cached wishlist of ``user_id``"""
+    _patch(user_id, lambda ids: ids - {product_id})
+
+
+def parse_product_ids(raw):
+    """Parse a comma-separated id list, ignoring junk and capping its length"""
+    ids = []
+    for part in raw.split(','):
+        part = part.strip()
+        if part.isdigit():
+            ids.append(int(part))
+            if len(ids) == MAX_STATUS_IDS:
+                break
+    return ids
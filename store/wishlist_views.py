@@ -1,21 +1,29 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib import messages
+from .instrumentation import query_budget
 from .models import Product, Wishlist
+from .wishlist import aget_wishlist_ids, get_wishlist_ids, parse_product_ids
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# add_to_wishlist and wishlist_status have async versions routed under ASGI
+# (STORE_ASYNC_VIEWS); see store.views
+
+@query_budget(8)
 @login_required
 def add_to_wishlist(request, product_id):
     """Add product to wishlist"""
     if request.method == 'GET' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         # Check if product is in wishlist
         try:
-            product = get_object_or_404(Product, id=product_id)
-            in_wishlist = Wishlist.objects.filter(user=request.user, product=product).exists()
+            if not Product.objects.filter(id=product_id).exists():
+                raise Http404('No Product matches the given query.')
+            in_wishlist = product_id in get_wishlist_ids(request.user)
             
             return JsonResponse({
                 'success': True,
@@ -25,38 +33,90 @@ def add_to_wishlist(request, product_id):
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
     elif request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return toggle_wishlist(request, product_id)
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+
+@query_budget(8)
+@login_required
+async def aadd_to_wishlist(request, product_id):
+    """Async version of add_to_wishlist"""
+    if request.method == 'GET' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         try:
-            product = get_object_or_404(Product, id=product_id, available=True)
+            user = await request.auser()
+            if not await Product.objects.filter(id=product_id).aexists():
+                raise Http404('No Product matches the given query.')
+            in_wishlist = product_id in await aget_wishlist_ids(user)
             
-            # Check if already in wishlist
-            try:
-                wishlist_item = Wishlist.objects.get(user=request.user, product=product)
-                # Item exists, remove it
-                wishlist_item.delete()
-                return JsonResponse({
-                    'success': True,
-                    'message': f'{product.name} removed from wishlist',
-                    'action': 'removed'
-                })
-            except Wishlist.DoesNotExist:
-                # Item doesn't exist, add it
-                Wishlist.objects.create(user=request.user, product=product)
-                return JsonResponse({
-                    'success': True,
-                    'message': f'{product.name} added to wishlist',
-                    'action': 'added'
-                })
-                
-        except Exception as e:
-            logger.error(f"Error adding to wishlist: {e}")
             return JsonResponse({
-                'success': False,
-                'message': f'Error updating wishlist: {str(e)}'
-            }, status=400)
+                'success': True,
+                'in_wishlist': in_wishlist
+            })
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    elif request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return await sync_to_async(toggle_wishlist)(request, product_id)
     
     return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
 
 
+@query_budget(4)
+def wishlist_status(request):
+    """Return which of the comma-separated ``ids`` the user has wishlisted"""
+    product_ids = parse_product_ids(request.GET.get('ids', ''))
+    wishlisted = get_wishlist_ids(request.user)
+    return JsonResponse({
+        'success': True,
+        'wishlisted': [product_id for product_id in product_ids if product_id in wishlisted],
+    })
+
+
+@query_budget(4)
+async def awishlist_status(request):
+    """Async version of wishlist_status"""
+    product_ids = parse_product_ids(request.GET.get('ids', ''))
+    wishlisted = await aget_wishlist_ids(await request.auser())
+    return JsonResponse({
+        'success': True,
+        'wishlisted': [product_id for product_id in product_ids if product_id in wishlisted],
+    })
+
+
+def toggle_wishlist(request, product_id):
+    """Add the product to the wishlist, or remove it if it is already there"""
+    try:
+        product = get_object_or_404(Product, id=product_id, available=True)
+        
+        # Check if already in wishlist
+        try:
+            wishlist_item = Wishlist.objects.get(user=request.user, product=product)
+            # Item exists, remove it
+            wishlist_item.delete()
+            return JsonResponse({
+                'success': True,
+                'message': f'{product.name} removed from wishlist',
+                'action': 'removed'
+            })
+        except Wishlist.DoesNotExist:
+            # Item doesn't exist, add it
+            Wishlist.objects.create(user=request.user, product=product)
+            return JsonResponse({
+                'success': True,
+                'message': f'{product.name} added to wishlist',
+                'action': 'added'
+            })
+            
+    except Exception as e:
+        logger.error(f"Error adding to wishlist: {e}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Error updating wishlist: {str(e)}'
+        }, status=400)
+
+
+@query_budget(8)
 @login_required
 def remove_from_wishlist(request, product_id):
     """Remove product from wishlist"""
@@ -86,6 +146,7 @@ def remove_from_wishlist(request, product_id):
     return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
 
 
+@query_budget(3)
 def share_product(request, product_slug):
     """Handle product sharing"""
     if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':